@@ -0,0 +1,45 @@
+import asyncio
+import statistics
+from typing import Dict, List, Sequence
+
+from handlers.handler_helpers import HandlingResult
+
+PERCENTILES = (50, 90, 99)
+
+
+class StubHandlers:
+    """
+    Gives a handler, which doesn't do anything (except waiting for `latency`
+    seconds, if it isn't 0), on every attribute access.
+    """
+
+    def __init__(self, latency: float = 0):
+        self.latency = latency
+
+    def __getattr__(self, name: str):
+        async def handler(*_args) -> HandlingResult:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            return HandlingResult(name)
+        return handler
+
+
+def get_percentiles(samples: Sequence[float]) -> Dict[str, float]:
+    """
+    Returns percentiles from PERCENTILES and the maximum of the samples.
+    """
+    if len(samples) < 2:
+        return {
+            **{f"p{percentile}": samples[0] for percentile in PERCENTILES},
+            "max": samples[0]
+        }
+    quantiles: List[float] = statistics.quantiles(
+        samples, n=100, method="inclusive"
+    )
+    return {
+        **{
+            f"p{percentile}": quantiles[percentile - 1]
+            for percentile in PERCENTILES
+        },
+        "max": max(samples)
+    }
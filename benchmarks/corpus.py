@@ -0,0 +1,46 @@
+"""
+Realistic commands (without the leading "/"), grouped by the kind of the
+command, for replaying them through the lexer and MainLogic.
+"""
+from typing import Dict, Tuple
+
+COMMANDS_CORPUS: Dict[str, Tuple[str, ...]] = {
+    "valid": (
+        "памятка", "memo", "инфо", "помощь", "help", "мдемонлист",
+        "мдемонлист 50", "мдемон 1", "мдемон Bloodbath", "демонлист",
+        "demonlist 75", "демон 3", "demon Tartarus", "игрок RobTop",
+        "player Riot", "уровень 128", "level Bloodbath", "поиск Sonic Wave",
+        "search Acu 3", "ДЕМОНЛИСТ 10", "Уровень 10565740"
+    ),
+    "typos": (
+        "помошь", "демонлсит", "мдемн 5", "урвоень 128", "игрк RobTop",
+        "демонлистт 10", "serach Acu", "инфоо", "памятк", "hlep демон"
+    ),
+    "wrong arguments": (
+        "мдемон", "мдемонлист 0", "демонлист -5", "демон", "уровень",
+        "игрок", "поиск", "search", "мдемонлист пять", "демон ",
+        "помощь ", "памятка лишний аргумент", "инфо 1"
+    ),
+    "long cyrillic": (
+        "мдемон Очень длинное название демона с кириллицей и пробелами",
+        "игрок Игрок с длинным ником, который точно не существует",
+        "поиск Уровень с очень длинным названием на русском языке 12",
+        "уровень Название уровня, которое никто никогда не найдёт в поиске",
+        "демон Ещё одно длинное название демона из ПК-демонлиста",
+        "неизвестнаякомандаоченьдлинная с аргументами через пробелы"
+    ),
+    "sequences": (
+        "помощь демон, игрок",
+        "help памятка,инфо,помощь",
+        "помощь мдемонлист, мдемон, демонлист, демон, игрок, уровень, поиск",
+        "помощь " + ", ".join(
+            ("памятка", "инфо", "помощь", "мдемонлист", "мдемон", "демонлист",
+             "демон", "игрок", "уровень", "поиск", "несуществующая") * 4
+        ),
+        "help memo , info , help , demon , player",
+        "помощь демон,, игрок",
+        "уровень 128, 10565740, 3979",
+        "player RobTop,Riot , Cyclic",
+        "level Bloodbath, Sonic Wave, Acu"
+    )
+}
@@ -0,0 +1,76 @@
+"""
+Measures the cost of dispatching one command in MainLogic.handle_command while
+the command table grows. The dispatch cost should stay flat, because only the
+commands with the same name as the incoming one are parsed.
+
+Run from the repository root: python -m benchmarks.dispatch_benchmark
+"""
+import asyncio
+import time
+from typing import List
+
+from benchmarks.benchmark_helpers import StubHandlers
+from lexer.arg_implementations import IntArgType, StringArgType
+from lexer.lexer_classes import Arg, Command
+from main_logic import MainLogic
+from main_logic_helpers import CommandsSection
+
+EXTRA_COMMANDS_AMOUNTS = (0, 10, 100, 1000)
+ITERATIONS = 2000
+COMMANDS = (
+    "памятка", "помощь демон, игрок", "мдемон 5", "демон Tartarus",
+    "поиск Bloodbath 2", "неизвестная команда", "демонлист abc"
+)
+
+
+def get_extra_commands(amount: int) -> List[Command]:
+    return [
+        Command(
+            names=(f"команда{num}", f"command{num}"),
+            handler=StubHandlers().extra_command,
+            arguments=(
+                Arg("строка", StringArgType()), Arg("число", IntArgType())
+            )
+        )
+        for num in range(amount)
+    ]
+
+
+async def measure(main_logic: MainLogic, command: str) -> float:
+    """
+    Returns the average dispatch time of the command in microseconds.
+    """
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        await main_logic.handle_command(123, command, {"from_id": 456})
+    return (time.perf_counter() - start) / ITERATIONS * 1_000_000
+
+
+async def main():
+    main_logic = MainLogic(vk_worker=None, handlers=StubHandlers())
+    base_sections = main_logic.command_sections
+    print(
+        "extra commands".ljust(16) + "".join(
+            command[:16].ljust(18) for command in COMMANDS
+        )
+    )
+    for extra_commands_amount in EXTRA_COMMANDS_AMOUNTS:
+        main_logic.command_sections = (
+            *base_sections, CommandsSection(
+                "Дополнительные команды",
+                tuple(get_extra_commands(extra_commands_amount))
+            )
+        )
+        main_logic.update_command_tables()
+        results = [
+            await measure(main_logic, command) for command in COMMANDS
+        ]
+        print(
+            str(extra_commands_amount).ljust(16) + "".join(
+                f"{result:.1f} us".ljust(18) for result in results
+            )
+        )
+
+
+if __name__ == "__main__":
+    asyncio.get_event_loop().run_until_complete(main())
@@ -0,0 +1,89 @@
+"""
+Compares parse time and peak memory of the mobile demonlist page for every
+installed bs4 tree builder, with the whole page parsed and with only the tags
+with demons parsed, and checks that the extracted demons are the same.
+
+Save the page first (for example, with "curl -L -o page.html
+https://sites.google.com/view/gd-mobile-lists/top-100-demons-completed"),
+then run from the repository root:
+python -m benchmarks.html_parsing_benchmark page.html [--iterations N]
+
+tracemalloc sees only the memory allocated by Python, so memory used inside
+lxml itself isn't counted (the resulting bs4 tree is).
+"""
+import argparse
+import importlib.util
+import statistics
+import time
+import tracemalloc
+from typing import Optional, List
+
+import bs4
+
+from requests_workers import mobile_demonlist
+from requests_workers.dataclasses_ import MobileDemonlist
+
+DEFAULT_ITERATIONS = 10
+# Tree builder name -> module, which should be installed to use it
+HTML_PARSERS = {"html.parser": None, "lxml": "lxml"}
+
+
+def parse(
+        html: str, html_parser: str,
+        parse_only: Optional[bs4.SoupStrainer]) -> MobileDemonlist:
+    return mobile_demonlist.get_mobile_demonlist_from_soup(
+        bs4.BeautifulSoup(html, html_parser, parse_only=parse_only)
+    )
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("page", help="path to the saved page")
+    arg_parser.add_argument(
+        "--iterations", type=int, default=DEFAULT_ITERATIONS
+    )
+    args = arg_parser.parse_args()
+    with open(args.page, "r", encoding="utf-8") as f:
+        html = f.read()
+    demonlists: List[MobileDemonlist] = []
+    print(
+        "backend".ljust(24) + "median time".ljust(16) + "peak memory".ljust(16)
+        + "demons"
+    )
+    for html_parser, required_module in HTML_PARSERS.items():
+        if (
+            required_module is not None
+            and importlib.util.find_spec(required_module) is None
+        ):
+            print(f"{html_parser} (not installed)")
+            continue
+        for parse_only in (None, mobile_demonlist.DEMONS_STRAINER):
+            times = []
+            for _ in range(args.iterations):
+                start = time.perf_counter()
+                parse(html, html_parser, parse_only)
+                times.append(time.perf_counter() - start)
+            tracemalloc.start()
+            demonlist = parse(html, html_parser, parse_only)
+            peak_memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            demonlists.append(demonlist)
+            name = html_parser + (" (strained)" if parse_only else "")
+            print(
+                name.ljust(24)
+                + f"{statistics.median(times) * 1000:.1f} ms".ljust(16)
+                + f"{peak_memory / 1024 / 1024:.1f} MiB".ljust(16)
+                + str(len(demonlist.demons))
+            )
+    # Only the parsed demons are compared, so the other fields of the
+    # snapshots don't matter
+    if all(
+        demonlist.demons == demonlists[0].demons for demonlist in demonlists
+    ):
+        print("Demons are the same for every backend")
+    else:
+        print("Demons are DIFFERENT for some backends!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Replays the commands corpus through Command.convert_command_to_args (every
+command of the real command table against every corpus command) and through
+MainLogic.handle_command, and reports throughput and latency percentiles for
+every kind of commands. Handlers are stubbed, so neither VK nor GD nor any
+other network access is needed.
+
+Run from the repository root:
+python -m benchmarks.lexer_benchmark [--rounds N] [--json PATH]
+    [--baseline PATH [--tolerance FRACTION]]
+
+With --baseline, the median latencies are compared with the ones from the
+report saved earlier with --json, and the exit code is 1 if any of them has
+grown more than the tolerance allows.
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from typing import Dict, List, Any
+
+import lexer.exceptions
+from benchmarks.benchmark_helpers import StubHandlers, get_percentiles
+from benchmarks.corpus import COMMANDS_CORPUS
+from lexer.lexer_classes import Command
+from main_logic import MainLogic
+
+DEFAULT_ROUNDS = 200
+DEFAULT_TOLERANCE = 0.2
+
+
+def convert_with_every_command(
+        commands: List[Command], command_text: str) -> None:
+    for command in commands:
+        try:
+            command.convert_command_to_args(command_text)
+        except lexer.exceptions.ParsingError:
+            pass
+
+
+def measure_lexer(
+        commands: List[Command], rounds: int) -> Dict[str, List[float]]:
+    """
+    Returns latencies of converting a corpus command with every command in
+    microseconds (by the kind of the commands).
+    """
+    samples: Dict[str, List[float]] = {kind: [] for kind in COMMANDS_CORPUS}
+    corpus = [
+        (kind, command_text)
+        for kind, command_texts in COMMANDS_CORPUS.items()
+        for command_text in command_texts
+    ]
+    for _ in range(rounds):
+        random.shuffle(corpus)
+        for kind, command_text in corpus:
+            start = time.perf_counter()
+            convert_with_every_command(commands, command_text)
+            samples[kind].append((time.perf_counter() - start) * 1_000_000)
+    return samples
+
+
+async def measure_dispatch(
+        main_logic: MainLogic, rounds: int) -> Dict[str, List[float]]:
+    """
+    Returns latencies of MainLogic.handle_command in microseconds (by the kind
+    of the commands).
+    """
+    samples: Dict[str, List[float]] = {kind: [] for kind in COMMANDS_CORPUS}
+    corpus = [
+        (kind, command_text)
+        for kind, command_texts in COMMANDS_CORPUS.items()
+        for command_text in command_texts
+    ]
+    for _ in range(rounds):
+        random.shuffle(corpus)
+        for kind, command_text in corpus:
+            start = time.perf_counter()
+            await main_logic.handle_command(
+                123, command_text, {"from_id": 456}
+            )
+            samples[kind].append((time.perf_counter() - start) * 1_000_000)
+    return samples
+
+
+def make_report(samples: Dict[str, List[float]]) -> Dict[str, Any]:
+    all_samples = [
+        sample for kind_samples in samples.values() for sample in kind_samples
+    ]
+    return {
+        "throughput_per_second": (
+            len(all_samples) / sum(all_samples) * 1_000_000
+        ),
+        "latency_us": {
+            "all": get_percentiles(all_samples),
+            **{
+                kind: get_percentiles(kind_samples)
+                for kind, kind_samples in samples.items()
+            }
+        }
+    }
+
+
+def print_report(name: str, report: Dict[str, Any]) -> None:
+    print(
+        f"• {name}: {report['throughput_per_second']:.0f} commands per second"
+    )
+    for kind, percentiles in report["latency_us"].items():
+        print(f"{kind}:".ljust(18) + "".join(
+            f"{percentile_name} {value:.1f} us".ljust(18)
+            for percentile_name, value in percentiles.items()
+        ))
+    print()
+
+
+def get_regressions(
+        reports: Dict[str, Any], baseline_reports: Dict[str, Any],
+        tolerance: float) -> List[str]:
+    regressions = []
+    for name, report in reports.items():
+        if name not in baseline_reports:
+            continue
+        baseline_latencies = baseline_reports[name]["latency_us"]
+        for kind, percentiles in report["latency_us"].items():
+            if kind not in baseline_latencies:
+                continue
+            median = percentiles["p50"]
+            baseline_median = baseline_latencies[kind]["p50"]
+            if median > baseline_median * (1 + tolerance):
+                regressions.append(
+                    f"{name}, {kind}: p50 {median:.1f} us (was "
+                    f"{baseline_median:.1f} us)"
+                )
+    return regressions
+
+
+async def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS)
+    arg_parser.add_argument(
+        "--json", help="path to the file for the machine-readable report"
+    )
+    arg_parser.add_argument(
+        "--baseline", help="path to the report to compare the results with"
+    )
+    arg_parser.add_argument(
+        "--tolerance", type=float, default=DEFAULT_TOLERANCE,
+        help="allowed relative growth of the median latencies"
+    )
+    args = arg_parser.parse_args()
+    main_logic = MainLogic(vk_worker=None, handlers=StubHandlers())
+    reports = {
+        "Command.convert_command_to_args (every command)": make_report(
+            measure_lexer(main_logic.commands_list, args.rounds)
+        ),
+        "MainLogic.handle_command": make_report(
+            await measure_dispatch(main_logic, args.rounds)
+        )
+    }
+    for name, report in reports.items():
+        print_report(name, report)
+    if args.json is not None:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(reports, f, ensure_ascii=False, indent=4)
+    if args.baseline is not None:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = get_regressions(
+                reports, json.load(f), args.tolerance
+            )
+        if regressions:
+            print("Regressions:\n" + "\n".join(regressions))
+            sys.exit(1)
+        print("No regressions")
+
+
+if __name__ == "__main__":
+    asyncio.get_event_loop().run_until_complete(main())
@@ -0,0 +1,396 @@
+"""
+Feeds a synthetic stream of "message_new" events from many peers into
+MainLogic.listen_for_vk_events through a fake VKWorker and prints a JSON
+report with the end-to-end latency percentiles (from the arrival of the event
+to the sent reply) for every command of the mix, the throughput, the peak
+amount of the commands and the asyncio tasks in flight, the memory usage, the
+depth and the latency of the VK send queue (and the queue waits of the
+requests to the GD servers, with the stand-ins).
+
+The handlers are either stubs with a fixed latency or the real ones working
+with the stand-in servers, which replay the given fixtures (see
+benchmarks.stand_in_servers).
+
+Run from the repository root (vk_secrets.ini is needed by MainLogic):
+python -m benchmarks.load_generator [--fixtures FIXTURES_DIR] [--rate 200]
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import dataclasses
+import itertools
+import json
+import random
+import resource
+import time
+import tracemalloc
+from typing import Dict, List, Optional, AsyncGenerator, Any
+
+import aiohttp
+
+from benchmarks.benchmark_helpers import StubHandlers, get_percentiles
+from benchmarks.stand_in_servers import StandInServers
+from main_logic import MainLogic, make_handlers, PARSING_PROCESSES
+from requests_workers.scheduler import PriorityScheduler
+from vk import vk_config
+from vk.dataclasses_ import Message
+from vk.vk_worker import VKWorker
+
+# Command (without "/") -> weight
+DEFAULT_COMMAND_MIX = {
+    "памятка": 1,
+    "помощь": 1,
+    "помощь демон, игрок": 1,
+    "демонлист 10": 3,
+    "демон 1": 3,
+    "демон Tartarus": 2,
+    "мдемонлист 10": 2,
+    "мдемон 5": 2,
+    "мдемон Zodiac": 1,
+    "уровень 128": 2,
+    "уровень 128, 1, 2": 1,
+    "игрок RobTop": 2,
+    "поиск Bloodbath": 1,
+    "поиск Bloodbath 2": 1,
+    "неизвестная команда": 1,
+}
+# How often the amount of the asyncio tasks is checked
+TASKS_SAMPLING_INTERVAL = 0.01  # In seconds
+# How long the commands, which are still running after the last event, are
+# waited for
+DRAIN_TIMEOUT = 60  # In seconds
+
+
+class FakeSimpleAVK:
+    """
+    Answers the messages.send and the "execute" calls of VKWorker after
+    `latency` seconds.
+    """
+
+    def __init__(self, latency: float = 0):
+        self.latency = latency
+
+    async def call_method(self, method_name: str, params: dict = None) -> Any:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if method_name == "execute":
+            return [1] * params["code"].count("API.messages.send(")
+        return 1
+
+
+class FakeVKWorker(VKWorker):
+    """
+    Yields the events with the given rate (constant or with exponentially
+    distributed intervals, like from independent users) and remembers the
+    arrival time of every event. Replies go through the send queue of VKWorker
+    to the VK API calls, which take `reply_latency` seconds.
+    """
+
+    def __init__(
+            self, command_mix: Dict[str, float], messages_amount: int,
+            rate: float, peers_amount: int, poisson: bool = True,
+            reply_latency: float = 0, seed: int = 0,
+            vk_requests_per_second: float = vk_config.REQUESTS_PER_SECOND):
+        # noinspection PyTypeChecker
+        super().__init__(
+            FakeSimpleAVK(reply_latency),
+            requests_per_second=vk_requests_per_second
+        )
+        self.command_mix = command_mix
+        self.messages_amount = messages_amount
+        self.rate = rate
+        self.peers_amount = peers_amount
+        self.poisson = poisson
+        self.random = random.Random(seed)
+        # Message id -> arrival time
+        self.arrival_times: Dict[int, float] = {}
+        self.replies_amount = 0
+
+    async def listen_for_messages(self) -> AsyncGenerator[Any, None]:
+        commands = list(self.command_mix)
+        weights = list(self.command_mix.values())
+        start_time = time.perf_counter()
+        next_arrival_time = 0.0
+        for message_id in range(self.messages_amount):
+            delay = start_time + next_arrival_time - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            command = self.random.choices(commands, weights)[0]
+            self.arrival_times[message_id] = time.perf_counter()
+            yield {
+                "id": message_id,
+                "peer_id": 2_000_000_000 + self.random.randrange(
+                    self.peers_amount
+                ),
+                "from_id": self.random.randrange(1, 1_000_000),
+                "text": f"/{command}",
+                "load_test_command": command
+            }
+            next_arrival_time += (
+                self.random.expovariate(self.rate) if self.poisson
+                else 1 / self.rate
+            )
+
+    async def reply(self, message: Message) -> None:
+        await super().reply(message)
+        self.replies_amount += 1
+
+
+class MeasuredMainLogic(MainLogic):
+    """
+    Records the end-to-end latency of every command.
+    """
+
+    def __init__(self, vk_worker: FakeVKWorker, *args, **kwargs):
+        super().__init__(vk_worker, *args, **kwargs)
+        self.fake_vk_worker = vk_worker
+        # Command -> latencies in seconds
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.commands_in_flight = 0
+        self.peak_commands_in_flight = 0
+        self.last_reply_time: Optional[float] = None
+
+    async def reply_to_vk_message(
+            self, current_chat_peer_id: int, command: str,
+            message_info: dict) -> None:
+        self.commands_in_flight += 1
+        self.peak_commands_in_flight = max(
+            self.peak_commands_in_flight, self.commands_in_flight
+        )
+        load_test_command = message_info["load_test_command"]
+        try:
+            await super().reply_to_vk_message(
+                current_chat_peer_id, command, message_info
+            )
+        except Exception:
+            self.errors[load_test_command] = (
+                self.errors.get(load_test_command, 0) + 1
+            )
+            raise
+        else:
+            self.last_reply_time = time.perf_counter()
+            self.latencies.setdefault(load_test_command, []).append(
+                self.last_reply_time
+                - self.fake_vk_worker.arrival_times[message_info["id"]]
+            )
+        finally:
+            self.commands_in_flight -= 1
+
+
+async def sample_tasks_amount(peak: List[int]) -> None:
+    """
+    Keeps the maximum amount of the asyncio tasks in peak[0].
+    """
+    while True:
+        peak[0] = max(peak[0], len(asyncio.all_tasks()))
+        await asyncio.sleep(TASKS_SAMPLING_INTERVAL)
+
+
+def get_latencies_report(latencies: List[float]) -> Dict[str, Any]:
+    if not latencies:
+        return {"count": 0}
+    return {
+        "count": len(latencies),
+        **{
+            f"{name}_ms": value * 1000
+            for name, value in get_percentiles(latencies).items()
+        }
+    }
+
+
+def get_vk_send_report(vk_worker: VKWorker) -> Dict[str, Any]:
+    stats = vk_worker.send_stats
+    return {
+        **{
+            name: value for name, value in dataclasses.asdict(stats).items()
+            if name != "last_send_latencies"
+        },
+        "send_latency": {
+            f"{name}_ms": value * 1000
+            for name, value in stats.get_send_latency_percentiles().items()
+        },
+        "rate_limit": get_scheduler_report(vk_worker.send_scheduler)
+    }
+
+
+def get_scheduler_report(scheduler: PriorityScheduler) -> Dict[str, Any]:
+    return {
+        "calls": {
+            priority.name.lower(): calls
+            for priority, calls in scheduler.stats.calls.items()
+        },
+        "queue_wait": {
+            **{
+                f"{name}_ms": value * 1000
+                for name, value in
+                scheduler.stats.get_queue_wait_percentiles().items()
+            },
+            "max_ms": scheduler.stats.max_queue_wait * 1000
+        },
+        "shed_calls": scheduler.stats.shed_calls
+    }
+
+
+async def run_load(
+        main_logic: MeasuredMainLogic,
+        vk_worker: FakeVKWorker) -> Dict[str, Any]:
+    peak_tasks = [0]
+    sampling_task = asyncio.create_task(sample_tasks_amount(peak_tasks))
+    start_time = time.perf_counter()
+    await main_logic.listen_for_vk_events()
+    drain_deadline = time.perf_counter() + DRAIN_TIMEOUT
+    while (
+        main_logic.commands_in_flight
+        and time.perf_counter() < drain_deadline
+    ):
+        await asyncio.sleep(TASKS_SAMPLING_INTERVAL)
+    sampling_task.cancel()
+    completed_amount = sum(map(len, main_logic.latencies.values()))
+    duration = (
+        (main_logic.last_reply_time or time.perf_counter()) - start_time
+    )
+    return {
+        "messages": vk_worker.messages_amount,
+        "completed": completed_amount,
+        "errors": sum(main_logic.errors.values()),
+        "unfinished": main_logic.commands_in_flight,
+        "duration_s": duration,
+        "throughput_per_s": completed_amount / duration if duration else 0,
+        "latency": {
+            "all": get_latencies_report(list(itertools.chain.from_iterable(
+                main_logic.latencies.values()
+            ))),
+            "by_command": {
+                command: {
+                    **get_latencies_report(
+                        main_logic.latencies.get(command, [])
+                    ),
+                    "errors": main_logic.errors.get(command, 0)
+                }
+                for command in sorted(
+                    main_logic.latencies.keys() | main_logic.errors.keys()
+                )
+            }
+        },
+        "peak_commands_in_flight": main_logic.peak_commands_in_flight,
+        "peak_tasks": peak_tasks[0],
+        "vk_send": get_vk_send_report(vk_worker),
+    }
+
+
+async def main(args: argparse.Namespace) -> Dict[str, Any]:
+    if args.mix is None:
+        command_mix = DEFAULT_COMMAND_MIX
+    else:
+        with open(args.mix, encoding="utf-8") as f:
+            command_mix = json.load(f)
+    vk_worker = FakeVKWorker(
+        command_mix, args.messages, args.rate, args.peers,
+        poisson=not args.constant_rate, reply_latency=args.reply_latency,
+        seed=args.seed, vk_requests_per_second=args.vk_rate
+    )
+    if args.tracemalloc:
+        tracemalloc.start()
+    if args.fixtures is None:
+        report = await run_load(
+            MeasuredMainLogic(
+                vk_worker, StubHandlers(latency=args.stub_latency)
+            ),
+            vk_worker
+        )
+    else:
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=PARSING_PROCESSES
+        ) as parsing_executor:
+            async with StandInServers(
+                args.fixtures, latency=args.upstream_latency,
+                latency_jitter=args.upstream_latency_jitter
+            ) as stand_ins, aiohttp.ClientSession() as aiohttp_session:
+                handlers = make_handlers(
+                    aiohttp_session, parsing_executor,
+                    stand_ins.get_upstream_links(), prefetch=args.prefetch
+                )
+                try:
+                    report = await run_load(
+                        MeasuredMainLogic(vk_worker, handlers), vk_worker
+                    )
+                finally:
+                    await handlers.requests_worker.close()
+                report["upstream_requests"] = {
+                    name: server.requests_amount
+                    for name, server in stand_ins.servers.items()
+                }
+                report["gd_scheduler"] = get_scheduler_report(
+                    handlers.gd_worker.scheduler
+                )
+                if args.prefetch:
+                    prefetch_stats = handlers.gd_worker.prefetch_stats
+                    report["gd_prefetch"] = {
+                        **dataclasses.asdict(prefetch_stats),
+                        "hit_rate": prefetch_stats.hit_rate
+                    }
+    report["max_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if args.tracemalloc:
+        report["tracemalloc_peak_kb"] = (
+            tracemalloc.get_traced_memory()[1] / 1024
+        )
+        tracemalloc.stop()
+    report["config"] = vars(args)
+    return report
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--messages", type=int, default=2000)
+    arg_parser.add_argument(
+        "--rate", type=float, default=200, help="messages per second"
+    )
+    arg_parser.add_argument("--peers", type=int, default=100)
+    arg_parser.add_argument(
+        "--constant-rate", action="store_true",
+        help="send the messages with equal intervals instead of random ones"
+    )
+    arg_parser.add_argument(
+        "--mix", help="JSON file with {command: weight} (without \"/\")"
+    )
+    arg_parser.add_argument(
+        "--fixtures",
+        help="replay these fixtures with the stand-ins instead of using stubs"
+    )
+    arg_parser.add_argument(
+        "--stub-latency", type=float, default=0,
+        help="latency of the stub handlers in seconds"
+    )
+    arg_parser.add_argument(
+        "--upstream-latency", type=float, default=0,
+        help="latency of the stand-in servers in seconds"
+    )
+    arg_parser.add_argument("--upstream-latency-jitter", type=float, default=0)
+    arg_parser.add_argument(
+        "--reply-latency", type=float, default=0,
+        help="latency of a VK API call in seconds"
+    )
+    arg_parser.add_argument(
+        "--vk-rate", type=float, default=vk_config.REQUESTS_PER_SECOND,
+        help="limit of the VK API calls per second"
+    )
+    arg_parser.add_argument(
+        "--prefetch", action="store_true",
+        help="enable the GD prefetching (with --fixtures)"
+    )
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument(
+        "--tracemalloc", action="store_true",
+        help="also report the peak of the Python allocations (slower)"
+    )
+    arg_parser.add_argument("--output", help="file for the report")
+    args = arg_parser.parse_args()
+    report_json = json.dumps(
+        asyncio.run(main(args)), ensure_ascii=False, indent=1
+    )
+    if args.output is None:
+        print(report_json)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report_json)
@@ -0,0 +1,531 @@
+"""
+Local stand-ins for Pointercrate, Google Sites, GD and VK, so the bot can be
+run and measured without the network.
+
+In the record mode every stand-in is a reverse proxy to its service, which
+saves the exchanges to the fixtures directory on exit. In the replay mode the
+stand-ins answer with the saved exchanges (with an artificial latency), and
+the VK stand-in serves its own longpoll server with the events added with
+VKStandInServer.add_events() and remembers the messages sent by the bot. The
+VK longpoll isn't recorded: in the record mode the bot gets the events from
+the VK longpoll server directly.
+
+Run from the repository root:
+python -m benchmarks.stand_in_servers record FIXTURES_DIR [--local]
+python -m benchmarks.stand_in_servers replay FIXTURES_DIR [--latency SECONDS]
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import random
+import urllib.parse
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple, FrozenSet, Any, Set
+
+import aiohttp
+from aiohttp import web
+
+from main_logic_helpers import UpstreamLinks
+
+HOST = "127.0.0.1"
+# Request headers, which are sent to the services in the record mode
+FORWARDED_REQUEST_HEADERS = (
+    "Content-Type", "Cookie", "User-Agent", "If-None-Match",
+    "If-Modified-Since"
+)
+# Response headers, which are saved and replayed
+SAVED_RESPONSE_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+LONGPOLL_PATH = "/stand_in_longpoll"
+LONGPOLL_WAIT = 25  # In seconds, like in simple_avk
+EXECUTE_SEND_PREFIX = "results.push(API.messages.send("
+EXECUTE_SEND_SUFFIX = "));"
+
+
+@dataclass(frozen=True)
+class Upstream:
+    """
+    name is also the name of the fixtures file. Ignored fields aren't saved
+    and aren't used for matching the requests (tokens, random ids).
+    missing_response is the (status, body) of the answer to the requests,
+    which weren't recorded.
+    """
+
+    name: str
+    base_url: str
+    ignored_fields: FrozenSet[str] = frozenset()
+    missing_response: Tuple[int, str] = (404, "")
+
+
+UPSTREAMS = (
+    Upstream("pointercrate", "https://pointercrate.com"),
+    Upstream("google_sites", "https://sites.google.com"),
+    # gd.py treats "-1" as "nothing found"
+    Upstream("gd", "http://www.boomlings.com", missing_response=(200, "-1")),
+    Upstream(
+        "vk", "https://api.vk.com",
+        ignored_fields=frozenset(("access_token", "random_id")),
+        missing_response=(200, "{\"response\": 1}")
+    ),
+)
+
+
+@dataclass
+class Exchange:
+    method: str
+    path: str
+    query: Dict[str, str]
+    # Form fields for the form-encoded bodies, the body text otherwise
+    form: Optional[Dict[str, str]]
+    body: str
+    status: int
+    headers: Dict[str, str]
+    response: bytes
+
+    def get_key(self) -> Tuple:
+        return get_request_key(
+            self.method, self.path, self.query, self.form, self.body
+        )
+
+    def to_json(self) -> Dict[str, Any]:
+        try:
+            response = self.response.decode("utf-8")
+            response_is_base64 = False
+        except UnicodeDecodeError:
+            response = base64.b64encode(self.response).decode("ascii")
+            response_is_base64 = True
+        return {
+            "method": self.method, "path": self.path, "query": self.query,
+            "form": self.form, "body": self.body, "status": self.status,
+            "headers": self.headers, "response": response,
+            "response_is_base64": response_is_base64
+        }
+
+    @classmethod
+    def from_json(cls, json_: Dict[str, Any]) -> "Exchange":
+        response = json_["response"]
+        return cls(
+            method=json_["method"], path=json_["path"], query=json_["query"],
+            form=json_["form"], body=json_["body"], status=json_["status"],
+            headers=json_["headers"], response=(
+                base64.b64decode(response) if json_["response_is_base64"]
+                else response.encode("utf-8")
+            )
+        )
+
+
+def get_request_key(
+        method: str, path: str, query: Dict[str, str],
+        form: Optional[Dict[str, str]], body: str) -> Tuple:
+    return (
+        method, path, tuple(sorted(query.items())),
+        body if form is None else tuple(sorted(form.items()))
+    )
+
+
+async def parse_request(
+        request: web.Request, ignored_fields: FrozenSet[str]
+        ) -> Tuple[Dict[str, str], Optional[Dict[str, str]], str, bytes]:
+    """
+    Returns the query and the form (or None) without the ignored fields, the
+    body text for matching (empty for forms) and the raw body.
+    """
+    raw_body = await request.read()
+    query = {
+        name: value for name, value in request.query.items()
+        if name not in ignored_fields
+    }
+    if request.content_type == "application/x-www-form-urlencoded":
+        form = {
+            name: value
+            for name, value in urllib.parse.parse_qsl(
+                raw_body.decode("utf-8"), keep_blank_values=True
+            )
+            if name not in ignored_fields
+        }
+        return query, form, "", raw_body
+    return query, None, raw_body.decode("utf-8", errors="replace"), raw_body
+
+
+class StandInServer:
+    """
+    Stand-in for one upstream. In the record mode (`record` is True) requests
+    are proxied to the upstream and recorded, otherwise they are answered with
+    the recorded exchanges: the exchanges with the same request are replayed
+    in the recorded order, and then the last one is repeated.
+
+    Every answer is delayed by `latency` seconds (± `latency_jitter` of it).
+    """
+
+    def __init__(
+            self, upstream: Upstream, exchanges: List[Exchange] = (),
+            record: bool = False, latency: float = 0,
+            latency_jitter: float = 0, port: int = 0):
+        self.upstream = upstream
+        self.record = record
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.port = port
+        self.exchanges: List[Exchange] = list(exchanges)
+        self.exchanges_by_key: Dict[Tuple, List[Exchange]] = {}
+        for exchange in self.exchanges:
+            self.exchanges_by_key.setdefault(
+                exchange.get_key(), []
+            ).append(exchange)
+        self.replayed_amounts: Dict[Tuple, int] = {}
+        self.requests_amount = 0
+        self.missing_requests_amount = 0
+        self._runner: Optional[web.AppRunner] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{HOST}:{self.port}"
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_route("*", "/{path:.*}", self.handle)
+        return app
+
+    async def start(self) -> None:
+        if self.record:
+            self._session = aiohttp.ClientSession(
+                auto_decompress=True, cookie_jar=aiohttp.DummyCookieJar()
+            )
+        self._runner = web.AppRunner(self.make_app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, HOST, self.port)
+        await site.start()
+        # Getting the port chosen by the system, if it was 0
+        self.port = self._runner.addresses[0][1]
+
+    async def stop(self) -> None:
+        await self._runner.cleanup()
+        if self._session is not None:
+            await self._session.close()
+
+    async def delay(self) -> None:
+        if self.latency:
+            await asyncio.sleep(self.latency * random.uniform(
+                1 - self.latency_jitter, 1 + self.latency_jitter
+            ))
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        self.requests_amount += 1
+        await self.delay()
+        query, form, body, raw_body = await parse_request(
+            request, self.upstream.ignored_fields
+        )
+        if self.record:
+            exchange = await self.proxy(request, query, form, body, raw_body)
+        else:
+            exchange = self.get_recorded_exchange(
+                get_request_key(request.method, request.path, query, form, body)
+            )
+            if exchange is None:
+                self.missing_requests_amount += 1
+                status, text = self.upstream.missing_response
+                return web.Response(status=status, text=text)
+            if (
+                "ETag" in exchange.headers
+                and request.headers.get("If-None-Match")
+                == exchange.headers["ETag"]
+            ):
+                return web.Response(status=304, headers=exchange.headers)
+        return web.Response(
+            status=exchange.status, body=exchange.response,
+            headers=exchange.headers
+        )
+
+    def get_recorded_exchange(self, key: Tuple) -> Optional[Exchange]:
+        exchanges = self.exchanges_by_key.get(key)
+        if not exchanges:
+            return None
+        replayed_amount = self.replayed_amounts.get(key, 0)
+        self.replayed_amounts[key] = replayed_amount + 1
+        return exchanges[min(replayed_amount, len(exchanges) - 1)]
+
+    async def proxy(
+            self, request: web.Request, query: Dict[str, str],
+            form: Optional[Dict[str, str]], body: str,
+            raw_body: bytes) -> Exchange:
+        async with self._session.request(
+            request.method, self.upstream.base_url + request.path_qs,
+            data=raw_body or None, allow_redirects=True, headers={
+                name: request.headers[name]
+                for name in FORWARDED_REQUEST_HEADERS
+                if name in request.headers
+            }
+        ) as response:
+            exchange = Exchange(
+                method=request.method, path=request.path, query=query,
+                form=form, body=body, status=response.status,
+                headers={
+                    name: response.headers[name]
+                    for name in SAVED_RESPONSE_HEADERS
+                    if name in response.headers
+                },
+                response=await response.read()
+            )
+        if exchange.status != 304:
+            self.exchanges.append(exchange)
+        return exchange
+
+
+class VKStandInServer(StandInServer):
+    """
+    In the replay mode also serves a longpoll server with the events from
+    add_events() instead of the VK one, and answers messages.send and the
+    "execute" calls made by VKWorker by remembering the sent messages. Sending
+    to the failing_peer_ids fails like sending to a user, who has forbidden the
+    messages from the group.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.events: List[Dict[str, Any]] = []
+        self.sent_events_amount = 0
+        self._new_events = asyncio.Event()
+        # (peer_id, text) in the order of sending
+        self.sent_messages: List[Tuple[int, str]] = []
+        self.send_calls_amount = 0
+        self.execute_calls_amount = 0
+        self.failing_peer_ids: Set[int] = set()
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        if not self.record:
+            app.router.add_route("*", LONGPOLL_PATH, self.handle_longpoll)
+            app.router.add_route(
+                "*", "/method/groups.getLongPollServer",
+                self.handle_get_longpoll_server
+            )
+            app.router.add_route(
+                "POST", "/method/messages.send", self.handle_send
+            )
+            app.router.add_route("POST", "/method/execute", self.handle_execute)
+        app.router.add_route("*", "/{path:.*}", self.handle)
+        return app
+
+    def add_events(self, events: List[Dict[str, Any]]) -> None:
+        self.events.extend(events)
+        self._new_events.set()
+
+    def add_message(self, peer_id: int, text: str, from_id: int = 1) -> None:
+        self.add_events([{
+            "type": "message_new",
+            "object": {"message": {
+                "peer_id": peer_id, "from_id": from_id, "text": text
+            }}
+        }])
+
+    async def handle_get_longpoll_server(
+            self, _request: web.Request) -> web.Response:
+        await self.delay()
+        return web.json_response({"response": {
+            "server": self.url + LONGPOLL_PATH, "key": "stand_in",
+            "ts": self.sent_events_amount
+        }})
+
+    def send_message(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Returns the VK error, if the message can't be sent to the peer.
+        """
+        peer_id = int(params["peer_id"])
+        if peer_id in self.failing_peer_ids:
+            return {
+                "error_code": 901,
+                "error_msg": "Can't send messages for users without permission"
+            }
+        self.sent_messages.append((peer_id, params["message"]))
+        return {}
+
+    async def handle_send(self, request: web.Request) -> web.Response:
+        self.requests_amount += 1
+        self.send_calls_amount += 1
+        await self.delay()
+        error = self.send_message(await request.post())
+        if error:
+            return web.json_response({"error": error})
+        return web.json_response({"response": len(self.sent_messages)})
+
+    async def handle_execute(self, request: web.Request) -> web.Response:
+        """
+        Understands only the code made by vk.vk_worker.get_execute_code().
+        """
+        self.requests_amount += 1
+        self.execute_calls_amount += 1
+        await self.delay()
+        results = []
+        errors = []
+        for line in (await request.post())["code"].splitlines():
+            if line.startswith(EXECUTE_SEND_PREFIX):
+                params = json.loads(
+                    line[len(EXECUTE_SEND_PREFIX):-len(EXECUTE_SEND_SUFFIX)]
+                )
+                error = self.send_message(params)
+                if error:
+                    results.append(False)
+                    errors.append({"method": "messages.send", **error})
+                    break  # Like the "return" after the failed call
+                results.append(len(self.sent_messages))
+        response: Dict[str, Any] = {"response": results}
+        if errors:
+            response["execute_errors"] = errors
+        return web.json_response(response)
+
+    async def handle_longpoll(self, request: web.Request) -> web.Response:
+        wait = float(request.query.get("wait", LONGPOLL_WAIT))
+        if self.sent_events_amount == len(self.events):
+            self._new_events.clear()
+            try:
+                await asyncio.wait_for(self._new_events.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+        updates = self.events[self.sent_events_amount:]
+        self.sent_events_amount = len(self.events)
+        return web.json_response({
+            "ts": self.sent_events_amount, "updates": updates
+        })
+
+
+class StandInServers:
+    """
+    Stand-ins for every upstream from UPSTREAMS with the fixtures in the given
+    directory (one JSON file per upstream).
+    """
+
+    def __init__(
+            self, fixtures_directory: str, record: bool = False,
+            latency: float = 0, latency_jitter: float = 0,
+            latencies: Optional[Dict[str, float]] = None):
+        """
+        latencies are latencies for the specific upstreams (by their names),
+        other upstreams get the `latency`.
+        """
+        self.fixtures_directory = fixtures_directory
+        self.record = record
+        if latencies is None:
+            latencies = {}
+        self.servers: Dict[str, StandInServer] = {
+            upstream.name: (
+                VKStandInServer if upstream.name == "vk" else StandInServer
+            )(
+                upstream,
+                [] if record else self.load_exchanges(upstream.name),
+                record=record, latency=latencies.get(upstream.name, latency),
+                latency_jitter=latency_jitter
+            )
+            for upstream in UPSTREAMS
+        }
+
+    @property
+    def vk(self) -> VKStandInServer:
+        # noinspection PyTypeChecker
+        return self.servers["vk"]
+
+    def get_fixtures_path(self, upstream_name: str) -> str:
+        return os.path.join(self.fixtures_directory, f"{upstream_name}.json")
+
+    def load_exchanges(self, upstream_name: str) -> List[Exchange]:
+        try:
+            with open(
+                self.get_fixtures_path(upstream_name), encoding="utf-8"
+            ) as f:
+                return [Exchange.from_json(json_) for json_ in json.load(f)]
+        except FileNotFoundError:
+            return []
+
+    def save_exchanges(self) -> None:
+        os.makedirs(self.fixtures_directory, exist_ok=True)
+        for name, server in self.servers.items():
+            with open(
+                self.get_fixtures_path(name), "w", encoding="utf-8"
+            ) as f:
+                json.dump(
+                    [exchange.to_json() for exchange in server.exchanges], f,
+                    ensure_ascii=False, indent=1
+                )
+
+    def get_upstream_links(self) -> UpstreamLinks:
+        """
+        Returns the links to the stand-ins with the same paths as in the
+        default links.
+        """
+        def replace_base(link: str, upstream_name: str) -> str:
+            parsed_link = urllib.parse.urlsplit(link)
+            return self.servers[upstream_name].url + urllib.parse.urlunsplit(
+                ("", "", parsed_link.path, parsed_link.query, "")
+            )
+        default_links = UpstreamLinks()
+        return UpstreamLinks(
+            pointercrate_demons=replace_base(
+                default_links.pointercrate_demons, "pointercrate"
+            ),
+            mobile_demons=replace_base(
+                default_links.mobile_demons, "google_sites"
+            ),
+            gd_database=replace_base(default_links.gd_database, "gd"),
+            vk_method=replace_base(default_links.vk_method, "vk")
+        )
+
+    async def start(self) -> None:
+        for server in self.servers.values():
+            await server.start()
+
+    async def stop(self) -> None:
+        for server in self.servers.values():
+            await server.stop()
+        if self.record:
+            self.save_exchanges()
+
+    async def __aenter__(self) -> "StandInServers":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *_exc_info) -> None:
+        await self.stop()
+
+
+async def main(args: argparse.Namespace) -> None:
+    # Needs vk_secrets.ini, so it is imported only when the bot is run
+    import main_logic
+
+    async with StandInServers(
+        args.fixtures_directory, record=args.mode == "record",
+        latency=args.latency, latency_jitter=args.latency_jitter
+    ) as stand_ins:
+        for name, server in stand_ins.servers.items():
+            print(f"{name}: {server.url}")
+        if args.serve_only:
+            await asyncio.Event().wait()
+        await main_logic.main(
+            debug=args.local, upstream_links=stand_ins.get_upstream_links()
+        )
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("mode", choices=("record", "replay"))
+    arg_parser.add_argument("fixtures_directory")
+    arg_parser.add_argument(
+        "--latency", type=float, default=0,
+        help="artificial latency of every answer in seconds"
+    )
+    arg_parser.add_argument(
+        "--latency-jitter", type=float, default=0,
+        help="part of the latency, by which it is randomly changed"
+    )
+    arg_parser.add_argument(
+        "--local", action="store_true",
+        help="read the commands from stdin instead of VK"
+    )
+    arg_parser.add_argument(
+        "--serve-only", action="store_true",
+        help="only run the stand-ins and print their links"
+    )
+    try:
+        asyncio.run(main(arg_parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
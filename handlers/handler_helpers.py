@@ -1,8 +1,11 @@
-import re
+import asyncio
+import logging
+import traceback
 from dataclasses import dataclass
-from typing import Generator, Union, List, Optional, Dict, Any
-
-import bs4
+from typing import (
+    Generator, List, Dict, Any, Callable, Awaitable, Sequence, TypeVar,
+    Optional
+)
 
 from requests_workers import dataclasses_
 from requests_workers.dataclasses_ import (
@@ -11,27 +14,12 @@ from requests_workers.dataclasses_ import (
 from requests_workers.requests_worker import RequestsWorker
 from vk.dataclasses_ import Message
 
-# noinspection SpellCheckingInspection
-# because it uses machine-generated tag class names
-CLASS_WITH_ONE_DEMON_NAME = "vhaaFf qUO6Ue"
-# noinspection SpellCheckingInspection
-COMPLETION_STRINGS_CLASS_NAME = (
-    "hJDwNd-AhqUyc-uQSCkd jXK9ad D2fZ2 wHaque GNzUNc"
-)
-POINTS_REGEX = re.compile(r".+\(~(.+) ?points\)")
-DEMON_NAME_REGEX = re.compile(
-    r"\d+\.\s*"  # Demon number
-    r"\"?(.+?)\"?\s+"  # Demon name
-    r"((?:by|\(old\)).+?)\s*"  # Demon authors + whether the demon is old or not
-    r"\(.+\)\s*"  # Points
-)
-AFTER_OLD_REGEX = re.compile(r"\(old\)\s*(.+)")
-AFTER_BY_REGEX = re.compile(r"by\s*(.+)")
-BEFORE_AND_MORE = re.compile(r"(.+?)\s*(?:and|&)\s*more")
+TargetType = TypeVar("TargetType")
 
-AnyMobileDemonInfo = Union[
-    dataclasses_.MobileDemonInfo, dataclasses_.CompactMobileDemonInfo
-]
+# Limits of the commands with several targets (like "/уровень 1, 2, 3")
+MULTI_TARGET_LIMIT = 10
+# Targets of one command, which are requested at the same time
+MULTI_TARGET_CONCURRENCY = 4
 
 
 @dataclass
@@ -43,110 +31,6 @@ class HandlingResult:
         return Message(self.text, peer_id)
 
 
-def get_mobile_demon_title_from_tag(tag: bs4.Tag):
-    return tag.find(class_="tyJCtd mGzaTb baZpAe").text
-
-
-def get_mobile_demon_info_from_tag(
-        tag: bs4.Tag, demon_num: int,
-        get_compact_demon_info: bool = False) -> AnyMobileDemonInfo:
-    f"""
-    Class with one demon is "{CLASS_WITH_ONE_DEMON_NAME}"
-    """
-    demon_title = get_mobile_demon_title_from_tag(tag)
-    demon_name, after_name = DEMON_NAME_REGEX.fullmatch(demon_title).groups()
-    match = AFTER_OLD_REGEX.fullmatch(after_name)
-    if match:
-        authors_string = match.group(1)
-        is_old = True
-    else:
-        authors_string = AFTER_BY_REGEX.fullmatch(after_name).group(1)
-        is_old = False
-    match = BEFORE_AND_MORE.fullmatch(authors_string)
-    if match:
-        authors_string = match.group(1)
-        there_is_more_authors = True
-    else:
-        there_is_more_authors = False
-    authors_string = authors_string.replace("&", "и")
-    if get_compact_demon_info:
-        return dataclasses_.CompactMobileDemonInfo(
-            place_in_list=demon_num,
-            name=demon_name, is_old=is_old, authors=authors_string,
-            there_is_more_authors=there_is_more_authors
-        )
-    pure_completions = []
-    last_nickname = None
-    completions_parsed = 0
-    hertz_string_parts = []
-    # noinspection SpellCheckingInspection
-    for string in tag.find(
-        class_=COMPLETION_STRINGS_CLASS_NAME
-    ).stripped_strings:
-        if string == "-":
-            continue
-        else:
-            if string.startswith("("):
-                hertz_string_parts.append(string)
-            if hertz_string_parts:
-                if not string.startswith("("):
-                    hertz_string_parts.append(string)
-                if string.endswith("hz)"):
-                    pure_completions[-1].amount_of_hertz = int(
-                        "".join(hertz_string_parts)[1:-3]
-                    )
-                    hertz_string_parts.clear()
-            elif completions_parsed == DEMON_RECORDS_OUTPUT_LIMIT:
-                break
-            elif last_nickname:  # Part we're parsing now is YT link
-                pure_completions.append(dataclasses_.Completion(
-                    nickname=last_nickname, video_link=string
-                ))
-                last_nickname = None
-                completions_parsed += 1
-            else:  # Part we're parsing now is a nickname
-                if string.endswith(" -"):
-                    last_nickname = string[:-2]
-                else:
-                    last_nickname = string
-    points_amount = float(
-        POINTS_REGEX.fullmatch(demon_title).group(1)
-    )
-    return dataclasses_.MobileDemonInfo(
-        place_in_list=demon_num,
-        name=demon_name, is_old=is_old, authors=authors_string,
-        there_is_more_authors=there_is_more_authors,
-        points=points_amount, completed_by=pure_completions
-    )
-
-
-def get_mobile_demons_from_soup(
-        soup: bs4.BeautifulSoup, limit: Optional[int] = None) -> List[bs4.Tag]:
-    return soup.find_all(class_=CLASS_WITH_ONE_DEMON_NAME, limit=limit)
-
-
-def get_mobile_demons_info_from_soup(
-        soup: bs4.BeautifulSoup, limit: Optional[int] = None,
-        get_compact_demon_info: bool = False
-        ) -> Generator[AnyMobileDemonInfo, None, None]:
-    return (
-        get_mobile_demon_info_from_tag(
-            raw_demon_info, demon_num=demon_num,
-            get_compact_demon_info=get_compact_demon_info
-        )
-        for demon_num, raw_demon_info in enumerate(
-            get_mobile_demons_from_soup(soup, limit=limit), start=1
-        )
-    )
-
-
-def get_mobile_demon_info_from_soup_by_num(
-        soup: bs4.BeautifulSoup, num: int) -> dataclasses_.MobileDemonInfo:
-    return get_mobile_demon_info_from_tag(
-        get_mobile_demons_from_soup(soup, limit=num)[num - 1], demon_num=num
-    )
-
-
 def get_compact_pc_demonlist_from_json(
         json_: List[dict]
         ) -> Generator[dataclasses_.CompactPCDemonInfo, None, None]:
@@ -192,15 +76,85 @@ def get_pc_demon_from_json(json_: Dict[str, Any]) -> dataclasses_.PCDemonInfo:
     )
 
 
-def get_demon_name_from_stripped_strings(
-        stripped_strings: Generator[bs4.NavigableString, None, None]) -> str:
-    # split("\"", maxsplit=2)[1] here does this:
-    # '1. "Title" by author' -> 'Title'
-    return next(stripped_strings).split("\"", maxsplit=2)[1]
+def get_demon_not_found_text(
+        demon_name: str, demonlist_name: str,
+        similar_demon_names: List[str]) -> str:
+    """
+    demonlist_name is a word before "демонлисте", like "ПК-" or "мобильном ".
+    """
+    text = (
+        f"Демон с названием \"{demon_name}\" не найден в "
+        f"{demonlist_name}демонлисте!"
+    )
+    if similar_demon_names:
+        similar_demon_names_str = ", ".join(
+            f"\"{similar_demon_name}\""
+            for similar_demon_name in similar_demon_names
+        )
+        text += f"\nВозможно, вы имели в виду: {similar_demon_names_str}?"
+    return text
+
 
+async def get_combined_handling_result(
+        targets: Sequence[TargetType],
+        get_handling_result: Callable[[TargetType], Awaitable[HandlingResult]],
+        targets_name: str,
+        logger: Optional[logging.Logger] = None) -> HandlingResult:
+    """
+    Gets the handling results for the targets concurrently (at most
+    MULTI_TARGET_CONCURRENCY at the same time) and joins them into one result
+    in the order of the targets, so they are sent as one reply.
 
-def get_demon_name_from_demon_tag(tag: bs4.Tag) -> str:
-    return get_mobile_demon_title_from_tag(tag).split("\"", maxsplit=2)[1]
+    targets_name is a genitive plural word for the targets, like "уровней".
+    Repeated and empty (like in "Bloodbath, ") targets are requested once or
+    skipped respectively.
+
+    If getting of the result for a target fails, the error is logged and the
+    result has an error line for the target instead. The first error is raised
+    only if every target fails.
+    """
+    targets = tuple(dict.fromkeys(
+        target for target in targets if target != ""
+    ))
+    if not targets:
+        return HandlingResult(
+            "Ошибка обработки команды на аргументе номер 1 (он неправильный "
+            "или пропущен)"
+        )
+    if len(targets) > MULTI_TARGET_LIMIT:
+        return HandlingResult(
+            f"За раз можно указать не больше {MULTI_TARGET_LIMIT} "
+            f"{targets_name}!"
+        )
+    semaphore = asyncio.Semaphore(MULTI_TARGET_CONCURRENCY)
+
+    async def get_text(target: TargetType) -> str:
+        async with semaphore:
+            return (await get_handling_result(target)).text
+
+    results = await asyncio.gather(
+        *map(get_text, targets), return_exceptions=True
+    )
+    exceptions = [
+        result for result in results if isinstance(result, BaseException)
+    ]
+    if len(exceptions) == len(results):
+        raise exceptions[0]
+    texts = []
+    for target, result in zip(targets, results):
+        if isinstance(result, BaseException):
+            if logger is not None:
+                logger.error(
+                    f"Ошибка на цели \"{target}\":\n" + "".join(
+                        traceback.TracebackException.from_exception(
+                            result
+                        ).format()
+                    )
+                )
+            texts.append(f"При обработке \"{target}\" произошла ошибка.")
+        else:
+            texts.append(result)
+    return HandlingResult("\n\n".join(texts))
 
 
 class HandlerHelpersWithDependencies:
@@ -1,4 +1,5 @@
-from typing import List, Tuple
+import logging
+from typing import List, Tuple, Optional
 
 import gd
 
@@ -7,14 +8,15 @@ from handlers import handler_helpers
 from handlers.handler_helpers import (
     HandlingResult, HandlerHelpersWithDependencies
 )
-from main_logic_helpers import CommandsSection
 from requests_workers import gd_worker
-from requests_workers.requests_worker import RequestsWorker
+from requests_workers.requests_worker import (
+    RequestsWorker, POINTERCRATE_DEMONS_AMOUNT
+)
+from requests_workers.scheduler import Priority
 from text_generators import gd_text_generators
 from vk import vk_config
 
 MOBILE_DEMONS_AMOUNT = 100
-POINTERCRATE_DEMONS_AMOUNT = 150
 
 
 class Handlers:
@@ -22,10 +24,16 @@ class Handlers:
     def __init__(
             self, requests_worker: RequestsWorker,
             gd_worker_: gd_worker.GDWorker,
-            handler_helpers_with_dependencies: HandlerHelpersWithDependencies):
+            handler_helpers_with_dependencies: HandlerHelpersWithDependencies,
+            logger: Optional[logging.Logger] = None):
+        """
+        The logger is for the errors, which don't fail the whole command (like
+        an error on one of the targets of "/уровень 1, 2, 3").
+        """
         self.requests_worker = requests_worker
         self.gd_worker = gd_worker_
         self.helpers_with_dependencies = handler_helpers_with_dependencies
+        self.logger = logger
 
     # noinspection PyMethodMayBeStatic
     # because maybe in future I will use it as a normal method, so this prevents
@@ -44,12 +52,7 @@ class Handlers:
         for command_name in command_names:
             try:
                 command_descriptions_as_strings.extend(
-                    # Here description_method is a
-                    # Command.get_short_full_description, if I set
-                    # Command.get_short_full_description as a type -
-                    # I wouldn't get any IDE hints anyway
-                    description_method()
-                    for description_method in command_descriptions[command_name]
+                    command_descriptions[command_name]
                 )
             except KeyError:
                 quoted_not_found_commands.append(f"\"{command_name}\"")
@@ -71,16 +74,8 @@ class Handlers:
     # noinspection PyMethodMayBeStatic
     # because maybe in future I will use it as a normal method, so this prevents
     # it from being called directly from the class
-    async def get_help_message(
-            self,
-            command_sections: Tuple[CommandsSection, ...]) -> HandlingResult:
-        return HandlingResult("\n\n".join([
-            "• Команды бота:", *[
-                command.get_compact_command_descriptions(
-                    add_dot_before_name=True
-                ) for command in command_sections
-            ]
-        ]))
+    async def get_help_message(self, help_message: str) -> HandlingResult:
+        return HandlingResult(help_message)
 
     # noinspection PyMethodMayBeStatic
     # because maybe in future I will use it as a normal method, so this prevents
@@ -98,14 +93,11 @@ class Handlers:
             demons_amount = MOBILE_DEMONS_AMOUNT
         else:
             beginning = ""
-        site = await self.requests_worker.get_mobile_demons_site()
+        demonlist = await self.requests_worker.get_mobile_demonlist()
         return HandlingResult(
             beginning + "\n".join(
-                demon.get_as_readable_string() for demon in (
-                    handler_helpers.get_mobile_demons_info_from_soup(
-                        site, get_compact_demon_info=True, limit=demons_amount
-                    )
-                )
+                demon.get_as_readable_string()
+                for demon in demonlist.compact_demons[:demons_amount]
             )
         )
 
@@ -114,10 +106,12 @@ class Handlers:
             return HandlingResult(
                 f"Слишком большой номер демона! (больше {MOBILE_DEMONS_AMOUNT})"
             )
-        soup = await self.requests_worker.get_mobile_demons_site()
-        demon = handler_helpers.get_mobile_demon_info_from_soup_by_num(
-            soup, demon_num
-        )
+        demonlist = await self.requests_worker.get_mobile_demonlist()
+        demon = demonlist.get_demon_by_num(demon_num)
+        if demon is None:
+            return HandlingResult(
+                f"Демона с номером {demon_num} нет в мобильном демонлисте!"
+            )
         return HandlingResult(demon.get_as_readable_string())
 
     async def get_pc_demonlist(
@@ -131,14 +125,13 @@ class Handlers:
             demons_amount = POINTERCRATE_DEMONS_AMOUNT
         else:
             beginning = ""
+        pc_demonlist = await self.requests_worker.get_pc_demonlist()
         return HandlingResult(
             beginning + "\n".join(
                 compact_demon_info.get_as_readable_string()
                 for compact_demon_info in (
                     handler_helpers.get_compact_pc_demonlist_from_json(
-                        await self.requests_worker.get_pc_demonlist_as_json(
-                            demons_amount
-                        )
+                        pc_demonlist.demons[:demons_amount]
                     )
                 )
             )
@@ -160,7 +153,8 @@ class Handlers:
         try:
             return HandlingResult(
                 await gd_text_generators.get_user_as_readable_string(
-                    await self.gd_worker.get_player(player_name)
+                    await self.gd_worker.get_player(player_name),
+                    scheduler=self.gd_worker.scheduler
                 )
             )
         except gd.MissingAccess:
@@ -168,6 +162,12 @@ class Handlers:
                 f"Пользователь с ником \"{player_name}\" не найден!"
             )
 
+    async def get_players_info(
+            self, player_names: Tuple[str, ...]) -> HandlingResult:
+        return await handler_helpers.get_combined_handling_result(
+            player_names, self.get_player_info, "игроков", self.logger
+        )
+
     async def get_level_info_by_name(self, level_name: str) -> HandlingResult:
         try:
             level = await self.gd_worker.get_level_by_name(level_name)
@@ -176,9 +176,15 @@ class Handlers:
                 f"Уровня с названием \"{level_name}\" не найдено!"
             )
         else:
-            return HandlingResult(
-                await gd_text_generators.get_level_as_readable_string(level)
-            )
+            return HandlingResult(await self._get_level_as_readable_string(
+                level
+            ))
+
+    async def get_levels_info_by_names(
+            self, level_names: Tuple[str, ...]) -> HandlingResult:
+        return await handler_helpers.get_combined_handling_result(
+            level_names, self.get_level_info_by_name, "уровней", self.logger
+        )
 
     async def get_level_info_by_id(self, level_id: int) -> HandlingResult:
         try:
@@ -186,64 +192,61 @@ class Handlers:
         except gd.MissingAccess:
             return HandlingResult(f"Уровня с айди {level_id} не существует!")
         else:
-            return HandlingResult(
-                await gd_text_generators.get_level_as_readable_string(level)
+            return HandlingResult(await self._get_level_as_readable_string(
+                level
+            ))
+
+    async def _get_level_as_readable_string(self, level: gd.Level) -> str:
+        # Levels from the search results are replaced with the full ones
+        # through the level cache
+        return await gd_text_generators.get_level_as_readable_string(
+            level, scheduler=self.gd_worker.scheduler,
+            get_full_level=None if self.gd_worker.is_full_level(level) else (
+                lambda: self.gd_worker.get_full_level(
+                    level.id, Priority.OPTIONAL
+                )
             )
+        )
+
+    async def get_levels_info_by_ids(
+            self, level_ids: Tuple[int, ...]) -> HandlingResult:
+        return await handler_helpers.get_combined_handling_result(
+            level_ids, self.get_level_info_by_id, "уровней", self.logger
+        )
 
     async def get_pc_demon_info_by_demon_name(
             self, demon_name: str) -> HandlingResult:
-        json_ = await self.requests_worker.get_pc_demonlist_as_json(
-            POINTERCRATE_DEMONS_AMOUNT
-        )
-        lower_demon_name = demon_name.lower()
-        for demon_info in json_:
-            if demon_info["name"].lower() == lower_demon_name:
-                return await (
-                    self.helpers_with_dependencies
-                    .get_handling_result_about_pc_demon(
-                        demon_info["id"]
-                    )
-                )
-        return HandlingResult(
-            f"Демон с названием \"{demon_name}\" не найден в ПК-демонлисте!"
+        demonlist = await self.requests_worker.get_pc_demonlist()
+        demon_id = demonlist.get_demon_id_by_name(demon_name)
+        if demon_id is None:
+            return HandlingResult(handler_helpers.get_demon_not_found_text(
+                demon_name, "ПК-",
+                demonlist.get_similar_demon_names(demon_name)
+            ))
+        return await (
+            self.helpers_with_dependencies.get_handling_result_about_pc_demon(
+                demon_id
+            )
         )
 
     async def get_mobile_demon_info_by_demon_name(
             self, demon_name: str) -> HandlingResult:
-        site = await self.requests_worker.get_mobile_demons_site()
-        demon_info_tag = site.find(
-            class_=handler_helpers.CLASS_WITH_ONE_DEMON_NAME
-        )
-        lower_demon_name = demon_name.lower()
-        demon_num = 1
-        while True:
-            if demon_info_tag is None:
-                return HandlingResult(
-                    f"Демон с названием \"{demon_name}\" не найден в мобильном "
-                    f"демонлисте!"
-                )
-            else:
-                # Demon's name is the first stripped string
-                if (
-                    handler_helpers.get_demon_name_from_demon_tag(
-                        demon_info_tag
-                    ).lower() == lower_demon_name
-                ):
-                    return HandlingResult(
-                        handler_helpers.get_mobile_demon_info_from_tag(
-                            demon_info_tag, demon_num=demon_num
-                        ).get_as_readable_string()
-                    )
-                else:
-                    demon_info_tag = demon_info_tag.find_next(
-                        class_=handler_helpers.CLASS_WITH_ONE_DEMON_NAME
-                    )
-            demon_num += 1
+        demonlist = await self.requests_worker.get_mobile_demonlist()
+        demon = demonlist.get_demon_by_name(demon_name)
+        if demon is None:
+            return HandlingResult(handler_helpers.get_demon_not_found_text(
+                demon_name, "мобильном ",
+                demonlist.get_similar_demon_names(demon_name)
+            ))
+        return HandlingResult(demon.get_as_readable_string())
 
     async def get_levels_from_gd_search(
             self, level_name: str, page_num: int) -> HandlingResult:
-        levels = await self.gd_worker.gd_client.search_levels(
-            level_name, pages=[page_num - 1]
+        levels = await self.gd_worker.search_levels(
+            level_name, page_num=page_num - 1
+        )
+        self.gd_worker.prefetch_after_search(
+            level_name, page_num=page_num - 1, levels=levels
         )
         if levels:
             levels_str = "\n".join(
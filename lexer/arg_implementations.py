@@ -1,4 +1,5 @@
 import re
+from functools import cached_property
 from typing import Optional
 
 from lexer.enums import GrammaticalCases, IntTypes
@@ -38,7 +39,7 @@ class IntArgType(BaseArgType):
                 return "положительных целых чисел"
             return "целых чисел больше нуля"
 
-    @property
+    @cached_property
     def regex(self) -> str:
         if self.type is IntTypes.SIGNED:
             return r"-?\d+"
@@ -64,14 +65,14 @@ class MonthNumberArgType(BaseArgType):
                 return "номера месяца"
             return "номеров месяцев"
 
-    @property
+    @cached_property
     def regex(self) -> str:
         return r"(?:0?[1-9]|1[012])"
 
     def convert(self, arg: str) -> int:
         return int(arg)
 
-    @property
+    @cached_property
     def description(self) -> str:
         return "число от 1 до 12 (еще можно писать 04 и аналогичное)"
 
@@ -97,7 +98,7 @@ class StringArgType(BaseArgType):
                 return string_word
             return f"{string_word} с лимитом {self.length_limit}"
 
-    @property
+    @cached_property
     def regex(self) -> str:
         if self.length_limit is None:
             return r".+?"
@@ -132,14 +133,14 @@ class SequenceArgType(BaseArgType):
             )
             return f"{sequence_word} {element_name}"
 
-    @property
+    @cached_property
     def regex(self) -> str:
         return (
             f"{self.element_type.regex}"
             f"(?:{self.separator}{self.element_type.regex})*"
         )
 
-    @property
+    @cached_property
     def description(self) -> str:
         return (
             f"От 1 до бесконечности элементов типа '{self.element_type.name}', "
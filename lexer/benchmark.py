@@ -0,0 +1,108 @@
+"""
+Compares building commands (which compiles their matchers from the regexes of
+the argument types), building them and parsing a corpus of inputs with them,
+and rendering their descriptions with fresh argument types, which compute
+their regexes, names and descriptions on the first access, and with already
+used argument types, which return cached values.
+
+Run from the repository root: python -m lexer.benchmark
+"""
+import timeit
+from typing import Callable, Tuple
+
+import lexer.exceptions
+from lexer.arg_implementations import (
+    IntArgType, StringArgType, SequenceArgType, MonthNumberArgType
+)
+from lexer.enums import IntTypes
+from lexer.lexer_classes import Arg, Command
+
+ITERATIONS = 5000
+# Inputs for the command from get_command(), the last ones are wrong
+PARSING_CORPUS = (
+    "команда абв, где, ёжз 1, 2, 3 04 строка с пробелами",
+    "command a 10 12 b",
+    "КОМАНДА первое,второе 5 1 ещё одна строка",
+    "command x 1 13 y",
+    "команда а 1",
+    "команда",
+    "неизвестная 1 2 3",
+)
+
+
+async def handler():
+    pass
+
+
+def get_arguments() -> Tuple[Arg, ...]:
+    return (
+        Arg("названия", SequenceArgType(SequenceArgType(StringArgType(10)))),
+        Arg("числа", SequenceArgType(IntArgType(IntTypes.GREATER_THAN_ZERO))),
+        Arg("месяц", MonthNumberArgType()),
+        Arg("строка", StringArgType())
+    )
+
+
+def get_command(arguments: Tuple[Arg, ...]) -> Command:
+    return Command(names=("команда", "command"), handler=handler,
+                   description="тестовая команда", arguments=arguments)
+
+
+def render_help(command: Command) -> str:
+    return (
+        command.get_full_description(include_type_descriptions=True)
+        + command.get_short_full_description()
+    )
+
+
+def parse_corpus(command: Command) -> None:
+    for input_ in PARSING_CORPUS:
+        try:
+            command.convert_command_to_args(input_)
+        except lexer.exceptions.ParsingError:
+            pass
+
+
+def measure(function: Callable[[], object]) -> float:
+    """
+    Returns the average execution time of the function in microseconds.
+    """
+    return timeit.timeit(function, number=ITERATIONS) / ITERATIONS * 1_000_000
+
+
+def main():
+    cached_arguments = get_arguments()
+    cached_command = get_command(cached_arguments)
+    render_help(cached_command)  # Filling the caches
+    fresh_commands = iter([
+        get_command(get_arguments()) for _ in range(ITERATIONS)
+    ])
+    results = (
+        (
+            "building a command",
+            measure(lambda: get_command(get_arguments())),
+            measure(lambda: get_command(cached_arguments))
+        ),
+        (
+            # Matchers are compiled, when the commands are built, so the
+            # cached regexes matter only with the building
+            "building, parsing",
+            measure(lambda: parse_corpus(get_command(get_arguments()))),
+            measure(lambda: parse_corpus(get_command(cached_arguments)))
+        ),
+        (
+            "rendering help",
+            measure(lambda: render_help(next(fresh_commands))),
+            measure(lambda: render_help(cached_command))
+        )
+    )
+    print("".ljust(20) + "fresh types".ljust(16) + "cached types")
+    for name, fresh_time, cached_time in results:
+        print(
+            name.ljust(20) + f"{fresh_time:.1f} us".ljust(16)
+            + f"{cached_time:.1f} us"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -21,3 +21,10 @@ class CommandDescriptionsConstantMetadataElement(BaseConstantMetadataElement):
     def get_data_from_constant_context(
             context: ConstantContext) -> my_typing.CommandDescriptionsDict:
         return context.command_descriptions
+
+
+class HelpMessageConstantMetadataElement(BaseConstantMetadataElement):
+
+    @staticmethod
+    def get_data_from_constant_context(context: ConstantContext) -> str:
+        return context.help_message
@@ -1,8 +1,11 @@
 import datetime
 import re
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
-from typing import Optional, Any, Tuple, Callable, Awaitable, Type
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import (
+    Optional, Any, Tuple, Callable, Awaitable, Type, Pattern, Dict, List
+)
 
 import lexer.exceptions
 import my_typing
@@ -17,9 +20,12 @@ class BaseArgType(ABC):
 
     It isn't static because quite often it has __init__, where you can specify
     some things, which affects the conversion and regex.
+
+    Argument types shouldn't be changed after __init__, because their regex,
+    names and description are computed once and then cached.
     """
 
-    @property
+    @cached_property
     def name(self) -> str:
         """
         Shortcut for the self.get_name()
@@ -29,6 +35,10 @@ class BaseArgType(ABC):
         """
         return self.get_name()
 
+    @cached_property
+    def _names_cache(self) -> Dict[Tuple[GrammaticalCases, bool], str]:
+        return {}
+
     @abstractmethod
     def _get_name(
             self, case: GrammaticalCases = GrammaticalCases.NOMINATIVE,
@@ -55,7 +65,7 @@ class BaseArgType(ABC):
             singular: bool = True) -> str:
         """
         Returns the name of the argument. If nothing found, raises a
-        NotImplementedError.
+        NotImplementedError. Names are cached for every case and form.
 
         Args:
             case:
@@ -71,16 +81,25 @@ class BaseArgType(ABC):
             NotImplementedError:
                 if name in the specified case and form isn't found
         """
-        name = self._get_name(case, singular)
-        if name is None:
-            raise lexer.exceptions.NameCaseNotFound(
-                f"There is no {case} for the name of {self.__class__.__name__}!"
-            )
-        return name
+        try:
+            return self._names_cache[case, singular]
+        except KeyError:
+            name = self._get_name(case, singular)
+            if name is None:
+                raise lexer.exceptions.NameCaseNotFound(
+                    f"There is no {case} for the name of "
+                    f"{self.__class__.__name__}!"
+                ) from None
+            self._names_cache[case, singular] = name
+            return name
 
     @property
     @abstractmethod
     def regex(self) -> str:
+        """
+        Implementations should use functools.cached_property instead of
+        property here, because regex doesn't change after __init__.
+        """
         pass
 
     @property
@@ -133,6 +152,7 @@ class ConstantContext:
 
     commands: Tuple["CommandsSection", ...]
     command_descriptions: my_typing.CommandDescriptionsDict
+    help_message: str
 
 
 class BaseMetadataElement(ABC):
@@ -202,49 +222,108 @@ class Command:
     constant_metadata: Tuple[Type[BaseConstantMetadataElement], ...] = ()
     fillers: tuple = ()
     arguments: Tuple[Arg, ...] = ()
+    # What needs to be between arguments (regex)
+    separator: str = " "
+    _matcher: Pattern = field(init=False, repr=False, compare=False)
+    # Index of the last matched group -> amount of arguments, which are matched
+    # successfully
+    _matched_args_amounts: Dict[int, int] = field(
+        init=False, repr=False, compare=False
+    )
+    # Indexes of the groups with the name and the arguments in the alternative,
+    # which matches the whole command
+    _full_match_groups: List[int] = field(
+        init=False, repr=False, compare=False
+    )
+
+    def __post_init__(self):
+        """
+        Compiles the matcher with two alternatives: the pattern, which matches
+        the whole command, and the pattern with the nested optional groups,
+        which matches the name and as many arguments as it can (like
+        `name(?: (a)(?: (b))?)?`). The deepest matched group of the second
+        alternative shows on which argument parsing has failed, so the command
+        is parsed with a single regex match, and the matcher grows linearly
+        with the amount of the arguments.
+
+        The first alternative is needed, because the optional groups don't
+        make the previous arguments match differently (which can be needed to
+        match the whole command). For the same reason, if an argument can
+        contain the separator, the failed argument is the one after the
+        arguments matched from left to right, not after the longest possible
+        match.
+        """
+        names = "|".join(re.escape(name) for name in self.names)
+        self._matched_args_amounts = {}
+        groups_amount = 0
+
+        def add_group(args_amount: int) -> int:
+            nonlocal groups_amount
+            groups_amount += 1
+            # The last matched group is the outermost group, which was closed
+            # the last, so it is the group of the last matched argument
+            self._matched_args_amounts[groups_amount] = args_amount
+            return groups_amount
+
+        # Something like (command) (\d\d)$
+        full_patterns = [f"({names})"]
+        self._full_match_groups = [add_group(0)]
+        for args_num, arg in enumerate(self.arguments, start=1):
+            full_patterns.append(f"({arg.type.regex})")
+            self._full_match_groups.append(add_group(args_num))
+            # Argument regex can contain its own groups
+            groups_amount += re.compile(arg.type.regex).groups
+        # Something like (command)(?: (\d\d))?. If it has matched every
+        # argument, the last one isn't matched till the end of the command, so
+        # parsing has failed on it (or on the name, if there are no arguments)
+        nested_pattern = f"({names})"
+        add_group(-1 if not self.arguments else 0)
+        closing_parts = []
+        for args_num, arg in enumerate(self.arguments, start=1):
+            nested_pattern += f"(?:{self.separator}({arg.type.regex})"
+            add_group(
+                args_num - 1 if args_num == len(self.arguments) else args_num
+            )
+            groups_amount += re.compile(arg.type.regex).groups
+            closing_parts.append(")?")
+        nested_pattern += "".join(closing_parts)
+        self._matcher = re.compile(
+            f"(?:{self.separator.join(full_patterns)}$)|(?:{nested_pattern})",
+            flags=re.DOTALL | re.IGNORECASE
+        )
 
-    def convert_command_to_args(
-            self, command: str, separator: str = " ") -> ConvertedCommand:
+    def convert_command_to_args(self, command: str) -> ConvertedCommand:
         """
         Takes some str, converts it to tuple with some values.
 
         Args:
             command:
                 user input (like "command arg1 arg2")
-            separator:
-                what symbol needs to be between arguments (regex); default " "
 
         Returns:
             tuple of some values, which are converted arguments from string
+
+        Raises:
+            lexer.exceptions.ParsingError:
+                with the number of the argument, on which parsing has failed (0
+                if it has failed on the name)
         """
-        for args_num in range(len(self.arguments) + 1):
-            names = '|'.join(re.escape(name) for name in self.names)
-            pattern = separator.join(
-                [
-                    f"({names})", *[
-                        f"({arg.type.regex})"
-                        for arg in self.arguments[:args_num]
-                    ]  # Something like (\d\d)
-                ]  # Something like (?i)(command) (\d\d)
-            ) + ("$" if args_num == len(self.arguments) else "")
-            rgx_result = re.match(
-                pattern, command, flags=re.DOTALL | re.IGNORECASE
-            )
-            if rgx_result is None:
-                raise lexer.exceptions.ParsingError(args_num)
-        # noinspection PyUnboundLocalVariable
-        # because range(len(self.arguments) + 1) will be at least with length of
-        # 1
-        rgx_groups = rgx_result.groups()
+        rgx_result = self._matcher.match(command)
+        if rgx_result is None:
+            raise lexer.exceptions.ParsingError(0)
+        matched_args_amount = self._matched_args_amounts[rgx_result.lastindex]
+        if matched_args_amount != len(self.arguments):
+            # Parsing has failed on the argument after the last matched one
+            raise lexer.exceptions.ParsingError(matched_args_amount + 1)
+        name_group, *argument_groups = self._full_match_groups
         # noinspection PyArgumentList
         # because IDK why it thinks that `arg` argument is already filled
         # (like `self`)
         return ConvertedCommand(
-            name=rgx_groups[0],
+            name=rgx_result.group(name_group),
             arguments=[
-                converter(group) for group, converter in zip(
-                    rgx_groups[1:], [arg.type.convert for arg in self.arguments]
-                )
+                arg.type.convert(rgx_result.group(group))
+                for group, arg in zip(argument_groups, self.arguments)
             ]
         )
 
@@ -1,8 +1,9 @@
+import argparse
 import asyncio
+import concurrent.futures
 import datetime
 import itertools
 import logging
-import sys
 import traceback
 from typing import NoReturn, Optional, Tuple
 
@@ -19,17 +20,24 @@ from handlers.handler_helpers import (
 from handlers.handlers import Handlers
 from lexer.arg_implementations import SequenceArgType, StringArgType, IntArgType
 from lexer.constant_metadata_implementations import (
-    CommandsConstantMetadataElement, CommandDescriptionsConstantMetadataElement
+    HelpMessageConstantMetadataElement,
+    CommandDescriptionsConstantMetadataElement
 )
 from lexer.lexer_classes import Command
 from lexer.lexer_classes import ConstantContext, Context, Arg
-from main_logic_helpers import CommandsSection
+from main_logic_helpers import (
+    CommandsSection, CommandsDispatchIndex, get_help_message, UpstreamLinks
+)
 from requests_workers.gd_worker import GDWorker
+from requests_workers.persistent_cache import PersistentCache
 from requests_workers.requests_worker import RequestsWorker
 from vk import vk_config
 from vk.dataclasses_ import Message
 from vk.vk_worker import VKWorker
 
+# Processes for parsing of the HTML pages
+PARSING_PROCESSES = 2
+
 
 class MainLogic:
 
@@ -68,7 +76,7 @@ class MainLogic:
                         description=(
                             "показывает помощь по командам и их написанию"
                         ),
-                        constant_metadata=(CommandsConstantMetadataElement,)
+                        constant_metadata=(HelpMessageConstantMetadataElement,)
                     ),
                     Command(
                         names=("помощь", "help"),
@@ -202,36 +210,45 @@ class MainLogic:
                 (
                     Command(
                         names=("игрок", "player"),
-                        handler=handlers.get_player_info,
-                        description="показывает информацию об игроке",
+                        handler=handlers.get_players_info,
+                        description=(
+                            "показывает информацию об игроке (или о "
+                            "нескольких игроках)"
+                        ),
                         arguments=(
                             Arg(
-                                "ник игрока", StringArgType()
+                                "ники игроков (через запятую)",
+                                SequenceArgType(StringArgType())
                             ),
                         )
                     ),
                     Command(
                         names=("уровень", "level"),
-                        handler=handlers.get_level_info_by_id,
-                        description="показывает информацию об уровне",
+                        handler=handlers.get_levels_info_by_ids,
+                        description=(
+                            "показывает информацию об уровне (или о "
+                            "нескольких уровнях)"
+                        ),
                         arguments=(
                             Arg(
-                                "айди уровня (>0)", IntArgType(
+                                "айди уровней (>0, через запятую)",
+                                SequenceArgType(IntArgType(
                                     lexer.enums.IntTypes.GREATER_THAN_ZERO
-                                )
+                                ))
                             ),
                         )
                     ),
                     Command(
                         names=("уровень", "level"),
-                        handler=handlers.get_level_info_by_name,
+                        handler=handlers.get_levels_info_by_names,
                         description=(
                             "показывает информацию о первом попавшемся уровне "
-                            "из поиска GD по указанному названию"
+                            "из поиска GD по каждому указанному названию"
                         ),
                         arguments=(
                             Arg(
-                                "название уровня", StringArgType()
+                                "названия уровней (через запятую)",
+                                SequenceArgType(StringArgType())
                             ),
                         )
                     ),
@@ -268,47 +285,70 @@ class MainLogic:
                 )
             )
         )
+        self.update_command_tables()
+
+    def update_command_tables(self) -> None:
+        """
+        Builds everything, that is derived from self.command_sections: the list
+        of commands, the dispatch index and the constant context with the
+        rendered help texts. Must be called after changing the command sections.
+        """
         command_descriptions: my_typing.CommandDescriptionsDict = {}
         for section in self.command_sections:
             for command in section.commands:
+                description = command.get_short_full_description()
                 for name in command.names:
                     try:
-                        command_descriptions[name].append(
-                            command.get_short_full_description
-                        )
+                        command_descriptions[name].append(description)
                     except KeyError:
-                        command_descriptions[name] = [
-                            command.get_short_full_description
-                        ]
+                        command_descriptions[name] = [description]
         self.commands_list = list(itertools.chain(
             *[section.commands for section in self.command_sections]
         ))
+        self.commands_index = CommandsDispatchIndex(self.commands_list)
         self.constant_context = ConstantContext(
-            self.command_sections, command_descriptions
+            self.command_sections, command_descriptions,
+            get_help_message(self.command_sections)
+        )
+
+    async def call_command_handler(
+            self, command: Command, arguments: list, current_chat_peer_id: int,
+            vk_message_info: dict) -> Message:
+        handling_result: HandlingResult = await command.handler(
+            *command.get_converted_metadata(
+                Context(vk_message_info, datetime.date.today())
+            ),
+            *command.get_converted_constant_metadata(self.constant_context),
+            *arguments,
+            *command.fillers
         )
+        return handling_result.to_message(current_chat_peer_id)
 
     async def handle_command(
             self, current_chat_peer_id: int, command: str,
             vk_message_info: dict) -> Message:
-        error_args_amount = 0
-        for command_ in self.commands_list:
+        command_without_arguments = (
+            self.commands_index.get_command_without_arguments(command)
+        )
+        if command_without_arguments is not None:
+            return await self.call_command_handler(
+                command_without_arguments, [], current_chat_peer_id,
+                vk_message_info
+            )
+        candidates, error_args_amount = self.commands_index.get_candidates(
+            command
+        )
+        for command_ in candidates:
             try:
                 converted_command = command_.convert_command_to_args(command)
             except lexer.exceptions.ParsingError as parsing_error:
                 if parsing_error.args_num > error_args_amount:
                     error_args_amount = parsing_error.args_num
             else:
-                handling_result: HandlingResult = await command_.handler(
-                    *command_.get_converted_metadata(
-                        Context(vk_message_info, datetime.date.today())
-                    ),
-                    *command_.get_converted_constant_metadata(
-                        self.constant_context
-                    ),
-                    *converted_command.arguments,
-                    *command_.fillers
+                return await self.call_command_handler(
+                    command_, converted_command.arguments,
+                    current_chat_peer_id, vk_message_info
                 )
-                return handling_result.to_message(current_chat_peer_id)
         if error_args_amount == 0:
             error_msg = "Ошибка обработки команды на её названии!"
             if self.logger is not None:
@@ -347,19 +387,32 @@ class MainLogic:
                         ).format()
                     )
                 )
-            await self.vk_worker.reply(Message(
+            replies = [Message(
                 f"Тут у юзера при обработке команды \"{text}\" произошла "
                 f"ошибка \"{str(exc)}\", это в логах тоже есть, "
                 f"гляньте, разберитесь...", vk_config.DEBUG_CHAT_PEER_ID
-            ))
+            )]
             if peer_id != vk_config.DEBUG_CHAT_PEER_ID:
-                await self.vk_worker.reply(Message(
+                replies.append(Message(
                     f"При обработке команды \"{text}\" произошла ошибка. "
                     f"Она была залоггирована, админы - уведомлены.", peer_id
                 ))
+            # Concurrently, so they are sent with one "execute" call
+            results = await asyncio.gather(
+                *map(self.vk_worker.reply, replies), return_exceptions=True
+            )
+            for reply, result in zip(replies, results):
+                if isinstance(result, Exception) and self.logger is not None:
+                    self.logger.error(
+                        f"Не удалось отправить сообщение об ошибке в чат с "
+                        f"peer_id {reply.peer_id}: {result!r}"
+                    )
 
     async def listen_for_vk_events(self) -> NoReturn:
         async for message_info in self.vk_worker.listen_for_messages():
+            # Not taking the new commands, while the replies can't be sent in
+            # time anyway
+            await self.vk_worker.wait_for_send_queue()
             text: str = message_info["text"]
             peer_id: int = message_info["peer_id"]
             if text.startswith("/"):
@@ -380,7 +433,60 @@ class MainLogic:
             print(output.text)
 
 
-async def main(debug: bool = False):
+async def main(
+        debug: bool = False, parsing_processes: int = PARSING_PROCESSES,
+        cache_directory: Optional[str] = None,
+        upstream_links: Optional[UpstreamLinks] = None,
+        prefetch: bool = False):
+    """
+    If cache_directory is given, the data from the upstreams is cached on the
+    disk in it, so the restarts are warm.
+
+    If prefetch is True, the data from the GD servers, which is likely to be
+    requested next, is requested in the background (see GDWorker).
+    """
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=parsing_processes
+    ) as parsing_executor:
+        await run_bot(
+            debug, parsing_executor, cache_directory, upstream_links, prefetch
+        )
+
+
+def make_handlers(
+        aiohttp_session: aiohttp.ClientSession,
+        parsing_executor: concurrent.futures.Executor,
+        upstream_links: UpstreamLinks,
+        persistent_cache: Optional[PersistentCache] = None,
+        prefetch: bool = False) -> Handlers:
+    requests_worker = RequestsWorker(
+        aiohttp_session, parsing_executor=parsing_executor,
+        persistent_cache=persistent_cache,
+        pointercrate_demons_link=upstream_links.pointercrate_demons,
+        mobile_demons_link=upstream_links.mobile_demons,
+        logger=logging.getLogger("requests_worker")
+    )
+    return Handlers(
+        requests_worker,
+        GDWorker(
+            gd.Client(url=upstream_links.gd_database), persistent_cache,
+            prefetch=prefetch, logger=logging.getLogger("gd_worker")
+        ),
+        HandlerHelpersWithDependencies(requests_worker),
+        logger=logging.getLogger("command_handling_errors")
+    )
+
+
+async def run_bot(
+        debug: bool,
+        parsing_executor: concurrent.futures.Executor,
+        cache_directory: Optional[str] = None,
+        upstream_links: Optional[UpstreamLinks] = None,
+        prefetch: bool = False) -> None:
+    if upstream_links is None:
+        upstream_links = UpstreamLinks()
+    # simple_avk has no option for the link, so it is changed globally
+    simple_avk.AVK.VK_METHOD_LINK = upstream_links.vk_method
     async with aiohttp.ClientSession() as aiohttp_session:
         vk_worker = VKWorker(
             simple_avk.SimpleAVK(
@@ -393,23 +499,48 @@ async def main(debug: bool = False):
             level=logging.INFO,
             format="[%(asctime)s | %(name)s | %(levelname)s] - %(message)s"
         )
-        requests_worker = RequestsWorker(aiohttp_session)
+        persistent_cache = (
+            None if cache_directory is None
+            else PersistentCache(
+                cache_directory, logger=logging.getLogger("persistent_cache")
+            )
+        )
+        handlers = make_handlers(
+            aiohttp_session, parsing_executor, upstream_links,
+            persistent_cache, prefetch
+        )
         main_logic = MainLogic(
-            vk_worker,
-            Handlers(
-                requests_worker,
-                GDWorker(gd.Client()),
-                HandlerHelpersWithDependencies(requests_worker)
-            ),
-            logging.getLogger("command_handling_errors")
+            vk_worker, handlers, logging.getLogger("command_handling_errors")
         )
-        if debug:
-            await main_logic.send_commands_from_stdin()
-        else:
-            print("Starting!")
-            await main_logic.listen_for_vk_events()
+        try:
+            if debug:
+                await main_logic.send_commands_from_stdin()
+            else:
+                print("Starting!")
+                await main_logic.listen_for_vk_events()
+        finally:
+            await handlers.requests_worker.close()
+            if persistent_cache is not None:
+                await persistent_cache.close()
 
 
 if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument(
+        "--local", action="store_true",
+        help="read the commands from stdin instead of VK"
+    )
+    arg_parser.add_argument(
+        "--cache-dir",
+        help="directory for the persistent cache of the upstream data"
+    )
+    arg_parser.add_argument(
+        "--prefetch", action="store_true",
+        help="prefetch the next search pages and the found levels"
+    )
+    args = arg_parser.parse_args()
     loop = asyncio.get_event_loop()
-    loop.run_until_complete(main(debug="--local" in sys.argv))
+    loop.run_until_complete(main(
+        debug=args.local, cache_directory=args.cache_dir,
+        prefetch=args.prefetch
+    ))
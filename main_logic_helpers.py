@@ -1,6 +1,8 @@
 import typing
 from dataclasses import dataclass
-from typing import Tuple
+from typing import Tuple, Iterable, Dict, List, Set, Optional
+
+from requests_workers import links
 
 if typing.TYPE_CHECKING:
     from lexer.lexer_classes import Command
@@ -20,3 +22,102 @@ class CommandsSection:
         return (
             f"{'• ' if add_dot_before_name else ''}{self.name}:\n{descriptions}"
         )
+
+
+@dataclass
+class UpstreamLinks:
+    """
+    Links to the services used by the bot, which can be changed to point the
+    bot at the stand-in servers (see benchmarks.stand_in_servers).
+
+    gd_database is the base of the GD server API, vk_method is the link to
+    the VK API methods with "{}" in place of the method name.
+    """
+
+    pointercrate_demons: str = links.POINTERCRATE_DEMONS_LINK
+    mobile_demons: str = links.MOBILE_DEMONS_LINK
+    gd_database: str = links.GD_DATABASE_LINK
+    vk_method: str = links.VK_METHOD_LINK
+
+
+def get_help_message(command_sections: Iterable[CommandsSection]) -> str:
+    return "\n\n".join([
+        "• Команды бота:", *[
+            section.get_compact_command_descriptions(add_dot_before_name=True)
+            for section in command_sections
+        ]
+    ])
+
+
+class CommandsDispatchIndex:
+    """
+    Maps case-folded command names to the commands with these names, so an
+    incoming command is parsed only by the commands, which can match it,
+    instead of every registered command.
+
+    Command names can't contain the separator, because the name of an incoming
+    command is everything before the first separator.
+    """
+
+    def __init__(self, commands: Iterable["Command"], separator: str = " "):
+        self.separator = separator
+        self.commands_by_name: Dict[str, List["Command"]] = {}
+        self.commands_without_arguments: Dict[str, "Command"] = {}
+        self.names_of_commands_with_arguments: Set[str] = set()
+        self.max_name_length = 0
+        for command in commands:
+            for name in command.names:
+                if separator in name:
+                    raise ValueError(
+                        f"Command name \"{name}\" contains the separator "
+                        f"\"{separator}\"!"
+                    )
+                folded_name = name.casefold()
+                commands_with_this_name = self.commands_by_name.setdefault(
+                    folded_name, []
+                )
+                if command not in commands_with_this_name:
+                    commands_with_this_name.append(command)
+                if command.arguments:
+                    self.names_of_commands_with_arguments.add(folded_name)
+                else:
+                    # The first registered command wins, as in a linear search
+                    self.commands_without_arguments.setdefault(
+                        folded_name, command
+                    )
+                self.max_name_length = max(
+                    self.max_name_length, len(folded_name)
+                )
+
+    def get_command_without_arguments(
+            self, command_text: str) -> Optional["Command"]:
+        """
+        Returns a command without arguments, which fully matches the given text,
+        or None.
+        """
+        if command_text.endswith("\n"):
+            # Regex "$" matches before the trailing newline too
+            command_text = command_text[:-1]
+        return self.commands_without_arguments.get(command_text.casefold())
+
+    def get_candidates(
+            self, command_text: str) -> Tuple[List["Command"], int]:
+        """
+        Returns commands, whose names are equal to the name of the given
+        command, and the number of the argument on which parsing of the given
+        command fails for the commands, which aren't returned (it is 1 when the
+        name of the given command starts with the name of some command with
+        arguments, because this command fails on its first argument then, and 0
+        otherwise).
+        """
+        folded_name = command_text.partition(self.separator)[0].casefold()
+        error_args_amount = 0
+        for name_length in range(
+                1, min(len(folded_name), self.max_name_length + 1)):
+            if (
+                folded_name[:name_length]
+                in self.names_of_commands_with_arguments
+            ):
+                error_args_amount = 1
+                break
+        return self.commands_by_name.get(folded_name, []), error_args_amount
@@ -1,3 +1,3 @@
-from typing import Callable, List, Dict
+from typing import List, Dict
 
-CommandDescriptionsDict = Dict[str, List[Callable[[], str]]]
+CommandDescriptionsDict = Dict[str, List[str]]
@@ -0,0 +1,159 @@
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass
+from typing import Generic, TypeVar, Callable, Awaitable, Optional, NoReturn
+
+import utils
+from requests_workers.persistent_cache import PersistentCache
+
+ValueType = TypeVar("ValueType")
+
+
+@dataclass
+class RefresherStats:
+    refreshes: int = 0
+    failed_refreshes: int = 0
+
+
+class BackgroundRefresher(Generic[ValueType]):
+    """
+    Keeps the value returned by the fetcher and refreshes it in the background
+    every `interval` seconds (± `jitter` of the interval), so the value is
+    served from memory and the upstream gets a constant request rate.
+
+    After a failed refresh the old value is still served and the next try is
+    made after `min_backoff` seconds, doubling with every failure up to
+    `max_backoff` seconds.
+
+    If the persistent cache is given, the value is saved to it under the
+    `persistent_key` after every refresh, and the first call of get() serves
+    the saved value (if there is one), while it is refreshed in the
+    background.
+    """
+
+    def __init__(
+            self, fetcher: Callable[[], Awaitable[ValueType]],
+            interval: float, jitter: float = 0.1, min_backoff: float = 30,
+            max_backoff: float = 10 * 60,
+            persistent_cache: Optional[PersistentCache] = None,
+            persistent_key: str = "",
+            logger: Optional[logging.Logger] = None):
+        self.fetcher = fetcher
+        self.persistent_cache = persistent_cache
+        self.persistent_key = persistent_key
+        self.interval = interval
+        self.jitter = jitter
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.logger = logger
+        self._log_background_error = utils.get_background_error_logger(
+            logger, "Ошибка в фоновой задаче"
+        )
+        self.stats = RefresherStats()
+        # Unix time of the last successful refresh
+        self.last_refresh_time: Optional[float] = None
+        self._value: Optional[ValueType] = None
+        self._refresh: Optional[asyncio.Future] = None
+        self._refreshing_task: Optional[asyncio.Task] = None
+
+    async def get(self) -> ValueType:
+        """
+        Returns the current value. The first call fetches the value and starts
+        the background refreshing.
+        """
+        self.start()
+        if self.last_refresh_time is None and self.persistent_cache is not None:
+            await self._load()
+        if self.last_refresh_time is None:
+            return await self.refresh()
+        return self._value
+
+    def get_current(self) -> Optional[ValueType]:
+        """
+        Returns the current value without fetching it (None before the first
+        successful refresh).
+        """
+        return self._value
+
+    def start(self) -> None:
+        if self._refreshing_task is None:
+            self._refreshing_task = asyncio.ensure_future(
+                self.refresh_periodically()
+            )
+
+    async def stop(self) -> None:
+        """
+        Stops the background refreshing and waits for it to finish.
+        """
+        if self._refreshing_task is not None:
+            refreshing_task = self._refreshing_task
+            self._refreshing_task = None
+            refreshing_task.cancel()
+            try:
+                await refreshing_task
+            except asyncio.CancelledError:
+                pass
+
+    async def refresh(self) -> ValueType:
+        """
+        Fetches a new value. Concurrent calls wait for the same fetch.
+        """
+        if self._refresh is None:
+            self._refresh = asyncio.ensure_future(self._fetch())
+        # Shielding, so the fetch isn't cancelled with one of its waiters
+        return await asyncio.shield(self._refresh)
+
+    async def _fetch(self) -> ValueType:
+        try:
+            value = await self.fetcher()
+        except Exception:
+            self.stats.failed_refreshes += 1
+            raise
+        else:
+            self._value = value
+            self.last_refresh_time = time.time()
+            self.stats.refreshes += 1
+            if self.persistent_cache is not None:
+                # Saving in the background, so the waiters don't wait for the
+                # disk
+                asyncio.ensure_future(self.persistent_cache.save(
+                    self.persistent_key, value, self.last_refresh_time
+                )).add_done_callback(self._log_background_error)
+            return value
+        finally:
+            self._refresh = None
+
+    async def _load(self) -> None:
+        entry = await self.persistent_cache.load(self.persistent_key)
+        # The value could be refreshed while it was loading
+        if entry is not None and self.last_refresh_time is None:
+            self.last_refresh_time, self._value = entry
+            asyncio.ensure_future(self.refresh()).add_done_callback(
+                self._log_background_error
+            )
+
+    def _get_jittered(self, delay: float) -> float:
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    async def refresh_periodically(self) -> NoReturn:
+        backoff: Optional[float] = None
+        while True:
+            await asyncio.sleep(self._get_jittered(
+                self.interval if backoff is None else backoff
+            ))
+            try:
+                await self.refresh()
+            except Exception as exc:
+                backoff = (
+                    self.min_backoff if backoff is None
+                    else min(backoff * 2, self.max_backoff)
+                )
+                if self.logger is not None:
+                    self.logger.warning(
+                        f"Ошибка при обновлении данных, следующая попытка "
+                        f"через ~{backoff} секунд: {exc!r}"
+                    )
+            else:
+                backoff = None
@@ -0,0 +1,262 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import (
+    Generic, TypeVar, Hashable, Dict, Tuple, Callable, Awaitable, Optional,
+    Any, Set, Type
+)
+
+import utils
+from requests_workers.persistent_cache import PersistentCache
+
+KeyType = TypeVar("KeyType", bound=Hashable)
+ValueType = TypeVar("ValueType")
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    # Misses, which were waiting for the fetch started by another miss
+    shared_fetches: int = 0
+    # Fetches, which have found out, that the stale value is still valid (like
+    # with HTTP 304 Not Modified); counted by the fetchers
+    revalidations: int = 0
+    # Values loaded from the persistent cache
+    warm_loads: int = 0
+    # Requests answered with the cached exception
+    negative_hits: int = 0
+    # Values and exceptions removed to fit into the max_size
+    evictions: int = 0
+
+
+@dataclass
+class HTTPDocument:
+    """
+    Response data with the validators for the conditional requests.
+    """
+
+    data: Any
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    def get_conditional_headers(self) -> Dict[str, str]:
+        headers = {}
+        if self.etag is not None:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified is not None:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class TTLCache(Generic[KeyType, ValueType]):
+    """
+    Stores the values returned by the fetchers for `ttl` seconds.
+
+    Fetches are single-flight: if a value is requested while it is being
+    fetched, the caller waits for the fetch, which is already running, instead
+    of starting another one. Exceptions from the fetchers aren't cached,
+    except the `negative_exceptions` (like "not found" errors), which are
+    raised again for `negative_ttl` seconds.
+
+    If max_size is given, the least recently used values are removed, when
+    there are more of them (cached exceptions are limited the same way).
+
+    Expired values are kept until they are replaced, so the fetchers can
+    revalidate them (see get_stale).
+
+    If the persistent cache is given, fetched values are saved to it under the
+    `namespace` prefix, and the values, which aren't in memory, are loaded from
+    it. Loaded values are served even if they are expired, while they are
+    revalidated in the background (stale-while-revalidate), so the restarts
+    don't make the users wait for the upstreams.
+    """
+
+    def __init__(
+            self, ttl: float,
+            persistent_cache: Optional[PersistentCache] = None,
+            namespace: str = "", max_size: Optional[int] = None,
+            negative_ttl: float = 0,
+            negative_exceptions: Tuple[Type[Exception], ...] = (),
+            logger: Optional[logging.Logger] = None):
+        self.ttl = ttl
+        self.persistent_cache = persistent_cache
+        self.namespace = namespace
+        self.max_size = max_size
+        self.negative_ttl = negative_ttl
+        self.negative_exceptions = negative_exceptions
+        self.logger = logger
+        self._log_background_error = utils.get_background_error_logger(
+            logger, "Ошибка при фоновой работе с кэшем"
+        )
+        self.stats = CacheStats()
+        # Key -> (fetch time, value); the least recently used first
+        self._values: "OrderedDict[KeyType, Tuple[float, ValueType]]" = (
+            OrderedDict()
+        )
+        # Key -> (fetch time, exception type, exception args); the least
+        # recently used first. Every negative hit raises a new exception, so
+        # the callers don't share (and change) one instance
+        self._exceptions: (
+            "OrderedDict[KeyType, Tuple[float, Type[Exception], tuple]]"
+        ) = OrderedDict()
+        self._fetches: Dict[KeyType, asyncio.Future] = {}
+        # Keys of the values loaded from the persistent cache, which weren't
+        # fetched since the loading
+        self._warm_keys: Set[KeyType] = set()
+
+    async def get(
+            self, key: KeyType,
+            fetcher: Callable[[], Awaitable[ValueType]]) -> ValueType:
+        """
+        Returns the cached value for the key, if it is fresh, otherwise awaits
+        the fetcher (or the fetch, which is already running for this key) and
+        caches its result.
+        """
+        try:
+            fetch_time, exception_type, exception_args = (
+                self._exceptions[key]
+            )
+        except KeyError:
+            pass
+        else:
+            if time.monotonic() - fetch_time < self.negative_ttl:
+                self.stats.negative_hits += 1
+                self._exceptions.move_to_end(key)
+                raise exception_type(*exception_args)
+            del self._exceptions[key]
+        if key not in self._values and self.persistent_cache is not None:
+            await self._load(key)
+        try:
+            fetch_time, value = self._values[key]
+        except KeyError:
+            pass
+        else:
+            age = time.monotonic() - fetch_time
+            if age < self.ttl:
+                self.stats.hits += 1
+                self._values.move_to_end(key)
+                return value
+            if (
+                key in self._warm_keys
+                and age < self.persistent_cache.max_age
+            ):
+                self.stats.hits += 1
+                self._values.move_to_end(key)
+                self._start_fetch(key, fetcher).add_done_callback(
+                    self._log_background_error
+                )
+                return value
+        if key in self._fetches:
+            self.stats.shared_fetches += 1
+        else:
+            self.stats.misses += 1
+        # Shielding, so the fetch isn't cancelled with one of its waiters
+        return await asyncio.shield(self._start_fetch(key, fetcher))
+
+    def _start_fetch(
+            self, key: KeyType,
+            fetcher: Callable[[], Awaitable[ValueType]]) -> asyncio.Future:
+        try:
+            return self._fetches[key]
+        except KeyError:
+            fetch = asyncio.ensure_future(self._fetch(key, fetcher))
+            self._fetches[key] = fetch
+            return fetch
+
+    async def _fetch(
+            self, key: KeyType,
+            fetcher: Callable[[], Awaitable[ValueType]]) -> ValueType:
+        try:
+            value = await fetcher()
+        except self.negative_exceptions as exception:
+            self._store(self._exceptions, key, (
+                time.monotonic(), type(exception), exception.args
+            ))
+            raise
+        else:
+            self.put(key, value)
+            return value
+        finally:
+            del self._fetches[key]
+
+    def put(
+            self, key: KeyType, value: ValueType,
+            persistent: bool = True) -> None:
+        """
+        Caches the value, which is got not by the fetcher for this key (like
+        from the results of a search), as a fresh one.
+
+        If persistent is False, the value isn't saved to the persistent cache
+        (like when it is valid only while the process is running).
+        """
+        self._store(self._values, key, (time.monotonic(), value))
+        self._exceptions.pop(key, None)
+        self._warm_keys.discard(key)
+        if persistent and self.persistent_cache is not None:
+            # Saving in the background, so the waiters don't wait for the disk
+            asyncio.ensure_future(self.persistent_cache.save(
+                self._get_persistent_key(key), value, time.time()
+            )).add_done_callback(self._log_background_error)
+
+    async def _load(self, key: KeyType) -> None:
+        entry = await self.persistent_cache.load(self._get_persistent_key(key))
+        # The value could be fetched while it was loading
+        if entry is not None and key not in self._values:
+            unix_fetch_time, value = entry
+            age = max(0.0, time.time() - unix_fetch_time)
+            self._store(self._values, key, (time.monotonic() - age, value))
+            self._warm_keys.add(key)
+            self.stats.warm_loads += 1
+
+    def _store(
+            self, entries: "OrderedDict[KeyType, Tuple[float, Any]]",
+            key: KeyType, entry: Tuple[float, Any]) -> None:
+        entries[key] = entry
+        entries.move_to_end(key)
+        if self.max_size is not None and len(entries) > self.max_size:
+            evicted_key, _entry = entries.popitem(last=False)
+            if entries is self._values:
+                self._warm_keys.discard(evicted_key)
+            self.stats.evictions += 1
+
+    def _get_persistent_key(self, key: KeyType) -> str:
+        return f"{self.namespace}{key!r}"
+
+    def has_fresh_value(self, key: KeyType) -> bool:
+        """
+        Returns True, if the value for the key is fresh or is being fetched.
+        Values in the persistent cache aren't checked.
+        """
+        if key in self._fetches:
+            return True
+        try:
+            fetch_time, _value = self._values[key]
+        except KeyError:
+            return False
+        return time.monotonic() - fetch_time < self.ttl
+
+    def get_stale(self, key: KeyType) -> Optional[ValueType]:
+        """
+        Returns the cached value for the key even if it is expired, or None.
+        """
+        try:
+            return self._values[key][1]
+        except KeyError:
+            return None
+
+    def invalidate(self, key: Optional[KeyType] = None) -> None:
+        """
+        Removes the value (and the cached exception) for the key or every
+        value, if the key is None.
+        """
+        if key is None:
+            self._values.clear()
+            self._exceptions.clear()
+            self._warm_keys.clear()
+        else:
+            self._values.pop(key, None)
+            self._exceptions.pop(key, None)
+            self._warm_keys.discard(key)
@@ -1,5 +1,8 @@
-from dataclasses import dataclass
-from typing import List, Optional
+from dataclasses import dataclass, field, InitVar
+from typing import List, Optional, Dict
+
+import utils
+from requests_workers.trigram_index import TrigramIndex
 
 
 DEMON_AUTHORS_OUTPUT_LIMIT = 10
@@ -57,6 +60,58 @@ class MobileDemonInfo(CompactMobileDemonInfo):
         )
 
 
+@dataclass
+class MobileDemonlist:
+    """
+    Snapshot of the parsed mobile demonlist with the demons indexed by their
+    positions and normalized names (see utils.normalize_demon_name).
+
+    The name index for the fuzzy search is updated from the index of the
+    previous snapshot, if it is given.
+    """
+
+    demons: List[MobileDemonInfo]
+    previous: InitVar[Optional["MobileDemonlist"]] = None
+    compact_demons: List[CompactMobileDemonInfo] = field(init=False)
+    demons_by_name: Dict[str, MobileDemonInfo] = field(init=False)
+    # Derived from the demons, so it isn't compared
+    name_index: TrigramIndex = field(init=False, compare=False, repr=False)
+
+    def __post_init__(self, previous: Optional["MobileDemonlist"]):
+        self.compact_demons = [
+            CompactMobileDemonInfo(
+                place_in_list=demon.place_in_list, name=demon.name,
+                is_old=demon.is_old, authors=demon.authors,
+                there_is_more_authors=demon.there_is_more_authors
+            )
+            for demon in self.demons
+        ]
+        self.demons_by_name = {}
+        for demon in self.demons:
+            # The first demon with the name wins
+            self.demons_by_name.setdefault(
+                utils.normalize_demon_name(demon.name), demon
+            )
+        self.name_index = (
+            TrigramIndex() if previous is None else previous.name_index
+        ).get_updated(demon.name for demon in self.demons)
+
+    def __reduce__(self):
+        # Only the demons are pickled, the indexes are rebuilt on unpickling
+        return self.__class__, (self.demons,)
+
+    def get_demon_by_num(self, demon_num: int) -> Optional[MobileDemonInfo]:
+        if 1 <= demon_num <= len(self.demons):
+            return self.demons[demon_num - 1]
+        return None
+
+    def get_demon_by_name(self, demon_name: str) -> Optional[MobileDemonInfo]:
+        return self.demons_by_name.get(utils.normalize_demon_name(demon_name))
+
+    def get_similar_demon_names(self, demon_name: str) -> List[str]:
+        return self.name_index.get_similar_names(demon_name)
+
+
 @dataclass
 class CompactPCDemonInfo:
     place_in_list: int
@@ -67,6 +122,47 @@ class CompactPCDemonInfo:
         return f"{self.place_in_list}. \"{self.name}\" от {self.publisher}"
 
 
+@dataclass
+class PCDemonlist:
+    """
+    Snapshot of the top of the PC demonlist (as JSON from Pointercrate) with the
+    ids of the demons indexed by their normalized names (see
+    utils.normalize_demon_name).
+
+    The name index for the fuzzy search is updated from the index of the
+    previous snapshot, if it is given.
+    """
+
+    demons: List[dict]
+    previous: InitVar[Optional["PCDemonlist"]] = None
+    demon_ids_by_name: Dict[str, int] = field(init=False)
+    # Derived from the demons, so it isn't compared
+    name_index: TrigramIndex = field(init=False, compare=False, repr=False)
+
+    def __post_init__(self, previous: Optional["PCDemonlist"]):
+        self.demon_ids_by_name = {}
+        for demon in self.demons:
+            # The first demon with the name wins
+            self.demon_ids_by_name.setdefault(
+                utils.normalize_demon_name(demon["name"]), demon["id"]
+            )
+        self.name_index = (
+            TrigramIndex() if previous is None else previous.name_index
+        ).get_updated(demon["name"] for demon in self.demons)
+
+    def __reduce__(self):
+        # Only the demons are pickled, the indexes are rebuilt on unpickling
+        return self.__class__, (self.demons,)
+
+    def get_demon_id_by_name(self, demon_name: str) -> Optional[int]:
+        return self.demon_ids_by_name.get(
+            utils.normalize_demon_name(demon_name)
+        )
+
+    def get_similar_demon_names(self, demon_name: str) -> List[str]:
+        return self.name_index.get_similar_names(demon_name)
+
+
 @dataclass
 class DemonRecord:
     player_name: str
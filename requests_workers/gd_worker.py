@@ -1,32 +1,382 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import (
+    Optional, List, Tuple, Hashable, Dict, Callable, Awaitable, Any, Set
+)
+
 import gd
 
+import utils
+from requests_workers.cache import TTLCache, KeyType, ValueType
+from requests_workers.persistent_cache import PersistentCache
+from requests_workers.scheduler import PriorityScheduler, Priority, CallShed
+
+PLAYER_TTL = 5 * 60  # In seconds
+LEVEL_TTL = 10 * 60  # In seconds
+SEARCH_TTL = 5 * 60  # In seconds
+# Users often repeat a failed lookup while fixing a typo, but the missing
+# things can appear, so they are remembered for less time
+NEGATIVE_TTL = 60  # In seconds
+PLAYERS_CACHE_SIZE = 1000
+LEVELS_CACHE_SIZE = 1000
+SEARCH_CACHE_SIZE = 500
+# Limits of the requests to the GD servers, so a burst of the commands doesn't
+# get the bot throttled or banned
+GD_REQUESTS_PER_SECOND = 10
+GD_REQUESTS_BURST = 20
+GD_CONCURRENCY = 8
+# Prefetches are dropped, when more requests are waiting for the limits
+GD_SHEDDING_THRESHOLD = 8
+# Levels on one page of the GD search
+SEARCH_PAGE_SIZE = 10
+# How many first levels from the served search page are prefetched in full
+PREFETCH_LEVELS_AMOUNT = 3
+# How many prefetched values are tracked for the hit rate
+PREFETCHED_KEYS_LIMIT = 1000
+# The ids of the levels from the search results are forgotten, when the levels
+# are evicted from the level cache, but only after there are this many ids
+PARTIAL_LEVEL_IDS_LIMIT = 2 * LEVELS_CACHE_SIZE
+
+
+def normalize_search_query(query: str) -> str:
+    return " ".join(query.split()).casefold()
+
 
 class LevelNotFound(Exception):
     pass
 
 
+@dataclass
+class PrefetchStats:
+    # Values put to the caches by the prefetches
+    prefetches: int = 0
+    # Prefetched values, which were requested by the users later
+    hits: int = 0
+    # Prefetches dropped by the scheduler under pressure
+    shed: int = 0
+    # Prefetches failed because of the GD errors
+    failures: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.prefetches if self.prefetches else 0
+
+
 class GDWorker:
 
-    def __init__(self, gd_client: gd.Client):
+    def __init__(
+            self, gd_client: gd.Client,
+            persistent_cache: Optional[PersistentCache] = None,
+            scheduler: Optional[PriorityScheduler] = None,
+            prefetch: bool = False,
+            logger: Optional[logging.Logger] = None):
+        """
+        If persistent_cache is given, the players and the levels are saved to
+        it and served from it after a restart, while they are revalidated. The
+        client is stored as a reference (GD entities keep their client), so it
+        is replaced with gd_client on loading.
+
+        Every request to the GD servers goes through the scheduler (a scheduler
+        with the GD_* limits by default). The requests made through the GD
+        entities (like comments of the levels) should go through it too.
+
+        If prefetch is True, the next page of the search and the first levels
+        of the served page are requested in the background with the PREFETCH
+        priority (see prefetch_after_search), because the users usually ask
+        for them next. Their hit rate is in prefetch_stats.
+        """
         self.gd_client = gd_client
+        self.scheduler = (
+            PriorityScheduler(
+                GD_REQUESTS_PER_SECOND, GD_REQUESTS_BURST, GD_CONCURRENCY,
+                shedding_threshold=GD_SHEDDING_THRESHOLD
+            ) if scheduler is None else scheduler
+        )
+        self.prefetch = prefetch
+        self.logger = logger
+        self._log_prefetch_error = utils.get_background_error_logger(
+            logger, "Ошибка при предзагрузке"
+        )
+        self.prefetch_stats = PrefetchStats()
+        # Ids of the levels in the level_cache, which are from the search
+        # results, so they don't have some data of the full levels (like
+        # passwords)
+        self._partial_level_ids: Set[int] = set()
+        # Prefetch key (like ("level", level id)) -> running prefetch
+        self._prefetches: Dict[Tuple[str, Hashable], asyncio.Future] = {}
+        # Keys of the prefetched values, which weren't requested yet; the
+        # oldest first
+        self._prefetched_keys: "OrderedDict[Tuple[str, Hashable], None]" = (
+            OrderedDict()
+        )
+        # Keys of the running prefetches, which were joined by the requests of
+        # the users
+        self._joined_prefetch_keys: Set[Tuple[str, Hashable]] = set()
+        if persistent_cache is not None:
+            persistent_cache.register_external_object("gd_client", gd_client)
+        # Keys are case-folded player names, because GD ignores the case
+        self.player_cache: TTLCache[str, gd.User] = TTLCache(
+            PLAYER_TTL, persistent_cache, namespace="gd_player:",
+            max_size=PLAYERS_CACHE_SIZE, negative_ttl=NEGATIVE_TTL,
+            negative_exceptions=(gd.MissingAccess,), logger=logger
+        )
+        self.level_cache: TTLCache[int, gd.Level] = TTLCache(
+            LEVEL_TTL, persistent_cache, namespace="gd_level:",
+            max_size=LEVELS_CACHE_SIZE, negative_ttl=NEGATIVE_TTL,
+            negative_exceptions=(gd.MissingAccess,), logger=logger
+        )
+        # Keys are (normalized query, page number from 0), because the search
+        # ignores the case and extra spaces. Found levels are also put to the
+        # level_cache. Empty pages are cached as LevelNotFound
+        self.search_cache: TTLCache[Tuple[str, int], List[gd.Level]] = (
+            TTLCache(
+                SEARCH_TTL, persistent_cache, namespace="gd_search:",
+                max_size=SEARCH_CACHE_SIZE, negative_ttl=NEGATIVE_TTL,
+                negative_exceptions=(LevelNotFound,), logger=logger
+            )
+        )
 
     async def get_player(self, player_name: str) -> gd.User:
         """
         Can throw gd.MissingAccess
         """
-        return await self.gd_client.search_user(player_name)
+        return await self.player_cache.get(
+            player_name.casefold(), lambda: self.scheduler.run(
+                lambda: self.gd_client.search_user(player_name)
+            )
+        )
 
     async def get_level_by_id(self, level_id: int) -> gd.Level:
         """
         Can throw gd.MissingAccess
+
+        The level can be from the search results (see is_full_level).
+        """
+        self._count_prefetch_hit(("level", level_id), self.level_cache)
+        return await self._get_cached(
+            self.level_cache, level_id, lambda: self._download_level(level_id)
+        )
+
+    async def get_full_level(
+            self, level_id: int,
+            priority: Priority = Priority.PRIMARY) -> gd.Level:
         """
-        return await self.gd_client.get_level(level_id)
+        Can throw gd.MissingAccess
+
+        Unlike get_level_by_id, replaces the level from the search results
+        with the full one (the fetch is shared with the other requests of this
+        level).
+        """
+        self._count_prefetch_hit(("level", level_id), self.level_cache)
+        self._forget_partial_level(level_id)
+        return await self._get_cached(
+            self.level_cache, level_id,
+            lambda: self._download_level(level_id, priority)
+        )
+
+    def _forget_partial_level(self, level_id: int) -> None:
+        # So the level cache fetches the full level
+        if level_id in self._partial_level_ids:
+            self.level_cache.invalidate(level_id)
+
+    async def _download_level(
+            self, level_id: int,
+            priority: Priority = Priority.PRIMARY) -> gd.Level:
+        level = await self.scheduler.run(
+            lambda: self.gd_client.get_level(level_id), priority
+        )
+        # The full level replaces the level from the search results
+        self._partial_level_ids.discard(level_id)
+        return level
 
     async def get_level_by_name(self, level_name: str) -> gd.Level:
         """
         Can throw LevelNotFound
+
+        The level is from the search results (see is_full_level).
         """
-        levels = await self.gd_client.search_levels(level_name, pages=[0])
+        levels = await self.search_levels(level_name, page_num=0)
         if levels:
             return levels[0]
         raise LevelNotFound(f"Level with name {level_name} not found!")
+
+    async def search_levels(
+            self, query: str, page_num: int) -> List[gd.Level]:
+        """
+        page_num starts from 0. Returns the cached list, so it shouldn't be
+        changed.
+        """
+        key = (normalize_search_query(query), page_num)
+        self._count_prefetch_hit(("search", key), self.search_cache)
+        try:
+            return await self._get_cached(
+                self.search_cache, key,
+                lambda: self.download_search_results(query, page_num)
+            )
+        except LevelNotFound:
+            return []
+
+    @staticmethod
+    async def _get_cached(
+            cache: TTLCache[KeyType, ValueType], key: KeyType,
+            fetcher: Callable[[], Awaitable[ValueType]]) -> ValueType:
+        """
+        Like cache.get, but if the joined fetch is a prefetch, which is dropped
+        by the scheduler, the value is fetched again with the fetcher.
+        """
+        try:
+            return await cache.get(key, fetcher)
+        except CallShed:
+            return await cache.get(key, fetcher)
+
+    async def download_search_results(
+            self, query: str, page_num: int,
+            priority: Priority = Priority.PRIMARY) -> List[gd.Level]:
+        """
+        Can throw LevelNotFound (if the page is empty)
+        """
+        levels = await self.scheduler.run(
+            lambda: self.gd_client.search_levels(query, pages=[page_num]),
+            priority
+        )
+        if not levels:
+            raise LevelNotFound(
+                f"Levels by the query {query} not found on the page "
+                f"{page_num}!"
+            )
+        for level in levels:
+            # Full levels aren't replaced with the levels from the search
+            if self.level_cache.get_stale(level.id) is None:
+                # Not saved to the persistent cache, because the ids of the
+                # levels from the search results are only in memory
+                self.level_cache.put(level.id, level, persistent=False)
+                self._partial_level_ids.add(level.id)
+        if len(self._partial_level_ids) > PARTIAL_LEVEL_IDS_LIMIT:
+            self._partial_level_ids = {
+                level_id for level_id in self._partial_level_ids
+                if self.level_cache.get_stale(level_id) is not None
+            }
+        return levels
+
+    def is_full_level(self, level: gd.Level) -> bool:
+        """
+        Levels from the search results need to be refreshed to get all the
+        data (like passwords). Levels, which aren't in the level_cache, aren't
+        considered full, because it is unknown, where they are from.
+        """
+        return (
+            level.id not in self._partial_level_ids
+            and self.level_cache.get_stale(level.id) is level
+        )
+
+    def prefetch_after_search(
+            self, query: str, page_num: int, levels: List[gd.Level]) -> None:
+        """
+        Starts the prefetches of the next search page (if the page with the
+        levels is full) and of the full first PREFETCH_LEVELS_AMOUNT levels,
+        if prefetching is enabled and they aren't cached yet.
+
+        page_num starts from 0.
+        """
+        if not self.prefetch:
+            return
+        if len(levels) == SEARCH_PAGE_SIZE:
+            next_page_key = (normalize_search_query(query), page_num + 1)
+            if not self.search_cache.has_fresh_value(next_page_key):
+                self._start_prefetch(
+                    ("search", next_page_key),
+                    lambda: self._prefetch_search_page(query, page_num + 1)
+                )
+        for level in levels[:PREFETCH_LEVELS_AMOUNT]:
+            if not self._has_fresh_full_level(level.id):
+                self._start_prefetch(
+                    ("level", level.id),
+                    # Default argument, so the lambda doesn't get the last id
+                    lambda level_id=level.id: self._prefetch_level(level_id)
+                )
+
+    def _has_fresh_full_level(self, level_id: int) -> bool:
+        return (
+            self.level_cache.has_fresh_value(level_id)
+            and level_id not in self._partial_level_ids
+        )
+
+    # Prefetches go through the caches, so the requests of the users join
+    # them instead of making the same requests. They return False, if the
+    # value was requested before they have started
+
+    async def _prefetch_search_page(self, query: str, page_num: int) -> bool:
+        key = (normalize_search_query(query), page_num)
+        if self.search_cache.has_fresh_value(key):
+            return False
+        try:
+            await self.search_cache.get(
+                key, lambda: self.download_search_results(
+                    query, page_num, Priority.PREFETCH
+                )
+            )
+        except LevelNotFound:
+            pass  # The empty page is cached too
+        return True
+
+    async def _prefetch_level(self, level_id: int) -> bool:
+        if self._has_fresh_full_level(level_id):
+            return False
+        self._forget_partial_level(level_id)
+        await self.level_cache.get(
+            level_id, lambda: self._download_level(level_id, Priority.PREFETCH)
+        )
+        return True
+
+    def _start_prefetch(
+            self, prefetch_key: Tuple[str, Hashable],
+            prefetcher: Callable[[], Awaitable[bool]]) -> None:
+        if prefetch_key in self._prefetches:
+            return
+        prefetch = asyncio.ensure_future(
+            self._prefetch(prefetch_key, prefetcher)
+        )
+        self._prefetches[prefetch_key] = prefetch
+        prefetch.add_done_callback(
+            lambda _future: self._prefetches.pop(prefetch_key)
+        )
+        prefetch.add_done_callback(self._log_prefetch_error)
+
+    async def _prefetch(
+            self, prefetch_key: Tuple[str, Hashable],
+            prefetcher: Callable[[], Awaitable[bool]]) -> None:
+        try:
+            value_is_put = await prefetcher()
+        except CallShed:
+            self.prefetch_stats.shed += 1
+        except gd.GDException:
+            self.prefetch_stats.failures += 1
+        else:
+            if value_is_put:
+                self.prefetch_stats.prefetches += 1
+                if prefetch_key in self._joined_prefetch_keys:
+                    self.prefetch_stats.hits += 1
+                else:
+                    self._prefetched_keys[prefetch_key] = None
+                    self._prefetched_keys.move_to_end(prefetch_key)
+                    if len(self._prefetched_keys) > PREFETCHED_KEYS_LIMIT:
+                        self._prefetched_keys.popitem(last=False)
+        finally:
+            self._joined_prefetch_keys.discard(prefetch_key)
+
+    def _count_prefetch_hit(
+            self, prefetch_key: Tuple[str, Hashable],
+            cache: TTLCache[Any, Any]) -> None:
+        if prefetch_key in self._prefetches:
+            # Counted when the prefetch is done, because it can fail
+            self._joined_prefetch_keys.add(prefetch_key)
+            return
+        try:
+            del self._prefetched_keys[prefetch_key]
+        except KeyError:
+            pass
+        else:
+            if cache.has_fresh_value(prefetch_key[1]):
+                self.prefetch_stats.hits += 1
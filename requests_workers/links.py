@@ -0,0 +1,10 @@
+# Default links to the services used by the bot (see also
+# main_logic_helpers.UpstreamLinks)
+
+POINTERCRATE_DEMONS_LINK = "https://pointercrate.com/api/v2/demons/"
+MOBILE_DEMONS_LINK = (
+    "https://sites.google.com/view/gd-mobile-lists/top-100-demons-completed"
+)
+GD_DATABASE_LINK = "http://www.boomlings.com/database/"
+# "{}" is replaced with the name of the method
+VK_METHOD_LINK = "https://api.vk.com/method/{}"
@@ -0,0 +1,160 @@
+import importlib.util
+import re
+from typing import Generator, Union, List, Optional
+
+import bs4
+
+from requests_workers import dataclasses_
+from requests_workers.dataclasses_ import DEMON_RECORDS_OUTPUT_LIMIT
+
+# lxml is faster, but it is an optional dependency
+DEFAULT_HTML_PARSER = (
+    "lxml" if importlib.util.find_spec("lxml") is not None else "html.parser"
+)
+
+# noinspection SpellCheckingInspection
+# because it uses machine-generated tag class names
+CLASS_WITH_ONE_DEMON_NAME = "vhaaFf qUO6Ue"
+# noinspection SpellCheckingInspection
+COMPLETION_STRINGS_CLASS_NAME = (
+    "hJDwNd-AhqUyc-uQSCkd jXK9ad D2fZ2 wHaque GNzUNc"
+)
+POINTS_REGEX = re.compile(r".+\(~(.+) ?points\)")
+DEMON_NAME_REGEX = re.compile(
+    r"\d+\.\s*"  # Demon number
+    r"\"?(.+?)\"?\s+"  # Demon name
+    r"((?:by|\(old\)).+?)\s*"  # Demon authors + whether the demon is old or not
+    r"\(.+\)\s*"  # Points
+)
+AFTER_OLD_REGEX = re.compile(r"\(old\)\s*(.+)")
+AFTER_BY_REGEX = re.compile(r"by\s*(.+)")
+BEFORE_AND_MORE = re.compile(r"(.+?)\s*(?:and|&)\s*more")
+
+# Only the tags with demons are parsed, everything else on the page is skipped
+DEMONS_STRAINER = bs4.SoupStrainer(class_=CLASS_WITH_ONE_DEMON_NAME)
+
+AnyMobileDemonInfo = Union[
+    dataclasses_.MobileDemonInfo, dataclasses_.CompactMobileDemonInfo
+]
+
+
+def parse_mobile_demons_site(
+        html: str, html_parser: str = DEFAULT_HTML_PARSER
+        ) -> bs4.BeautifulSoup:
+    """
+    Parses only the tags with demons. html_parser is a name of the bs4 tree
+    builder, which supports parse_only (like "lxml" or "html.parser").
+    """
+    return bs4.BeautifulSoup(html, html_parser, parse_only=DEMONS_STRAINER)
+
+
+def get_mobile_demon_title_from_tag(tag: bs4.Tag):
+    return tag.find(class_="tyJCtd mGzaTb baZpAe").text
+
+
+def get_mobile_demon_info_from_tag(
+        tag: bs4.Tag, demon_num: int,
+        get_compact_demon_info: bool = False) -> AnyMobileDemonInfo:
+    f"""
+    Class with one demon is "{CLASS_WITH_ONE_DEMON_NAME}"
+    """
+    demon_title = get_mobile_demon_title_from_tag(tag)
+    demon_name, after_name = DEMON_NAME_REGEX.fullmatch(demon_title).groups()
+    match = AFTER_OLD_REGEX.fullmatch(after_name)
+    if match:
+        authors_string = match.group(1)
+        is_old = True
+    else:
+        authors_string = AFTER_BY_REGEX.fullmatch(after_name).group(1)
+        is_old = False
+    match = BEFORE_AND_MORE.fullmatch(authors_string)
+    if match:
+        authors_string = match.group(1)
+        there_is_more_authors = True
+    else:
+        there_is_more_authors = False
+    authors_string = authors_string.replace("&", "и")
+    if get_compact_demon_info:
+        return dataclasses_.CompactMobileDemonInfo(
+            place_in_list=demon_num,
+            name=demon_name, is_old=is_old, authors=authors_string,
+            there_is_more_authors=there_is_more_authors
+        )
+    pure_completions = []
+    last_nickname = None
+    completions_parsed = 0
+    hertz_string_parts = []
+    # noinspection SpellCheckingInspection
+    for string in tag.find(
+        class_=COMPLETION_STRINGS_CLASS_NAME
+    ).stripped_strings:
+        if string == "-":
+            continue
+        else:
+            if string.startswith("("):
+                hertz_string_parts.append(string)
+            if hertz_string_parts:
+                if not string.startswith("("):
+                    hertz_string_parts.append(string)
+                if string.endswith("hz)"):
+                    pure_completions[-1].amount_of_hertz = int(
+                        "".join(hertz_string_parts)[1:-3]
+                    )
+                    hertz_string_parts.clear()
+            elif completions_parsed == DEMON_RECORDS_OUTPUT_LIMIT:
+                break
+            elif last_nickname:  # Part we're parsing now is YT link
+                pure_completions.append(dataclasses_.Completion(
+                    nickname=last_nickname, video_link=string
+                ))
+                last_nickname = None
+                completions_parsed += 1
+            else:  # Part we're parsing now is a nickname
+                if string.endswith(" -"):
+                    last_nickname = string[:-2]
+                else:
+                    last_nickname = string
+    points_amount = float(
+        POINTS_REGEX.fullmatch(demon_title).group(1)
+    )
+    return dataclasses_.MobileDemonInfo(
+        place_in_list=demon_num,
+        name=demon_name, is_old=is_old, authors=authors_string,
+        there_is_more_authors=there_is_more_authors,
+        points=points_amount, completed_by=pure_completions
+    )
+
+
+def get_mobile_demons_from_soup(
+        soup: bs4.BeautifulSoup, limit: Optional[int] = None) -> List[bs4.Tag]:
+    return soup.find_all(class_=CLASS_WITH_ONE_DEMON_NAME, limit=limit)
+
+
+def get_mobile_demons_info_from_soup(
+        soup: bs4.BeautifulSoup, limit: Optional[int] = None,
+        get_compact_demon_info: bool = False
+        ) -> Generator[AnyMobileDemonInfo, None, None]:
+    return (
+        get_mobile_demon_info_from_tag(
+            raw_demon_info, demon_num=demon_num,
+            get_compact_demon_info=get_compact_demon_info
+        )
+        for demon_num, raw_demon_info in enumerate(
+            get_mobile_demons_from_soup(soup, limit=limit), start=1
+        )
+    )
+
+
+def get_mobile_demonlist_from_soup(
+        soup: bs4.BeautifulSoup) -> dataclasses_.MobileDemonlist:
+    return dataclasses_.MobileDemonlist(list(
+        get_mobile_demons_info_from_soup(soup)
+    ))
+
+
+def get_mobile_demons_info_from_html(
+        html: str, html_parser: str = DEFAULT_HTML_PARSER
+        ) -> List[dataclasses_.MobileDemonInfo]:
+    return list(get_mobile_demons_info_from_soup(
+        parse_mobile_demons_site(html, html_parser)
+    ))
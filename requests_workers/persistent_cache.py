@@ -0,0 +1,214 @@
+import asyncio
+import concurrent.futures
+import io
+import logging
+import os
+import pickle
+import sqlite3
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+PERSISTENT_CACHE_FILE_NAME = "cache.sqlite3"
+PERSISTENT_CACHE_MAX_SIZE = 64 * 1024 * 1024  # In bytes (compressed)
+# Older entries aren't served even while they are revalidated
+PERSISTENT_CACHE_MAX_AGE = 24 * 60 * 60  # In seconds
+COMPRESSION_LEVEL = 6
+
+
+@dataclass
+class PersistentCacheStats:
+    loads: int = 0
+    saves: int = 0
+    # Values, which weren't saved, because they can't be pickled
+    failed_saves: int = 0
+
+
+class _Pickler(pickle.Pickler):
+
+    def __init__(self, file, external_ids: Dict[int, str]):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.external_ids = external_ids
+
+    def persistent_id(self, obj: Any) -> Optional[str]:
+        return self.external_ids.get(id(obj))
+
+
+class _Unpickler(pickle.Unpickler):
+
+    def __init__(self, file, external_objects: Dict[str, Any]):
+        super().__init__(file)
+        self.external_objects = external_objects
+
+    def persistent_load(self, pid: str) -> Any:
+        try:
+            return self.external_objects[pid]
+        except KeyError:
+            raise pickle.UnpicklingError(
+                f"External object \"{pid}\" isn't registered!"
+            )
+
+
+class PersistentCache:
+    """
+    Stores pickled and zlib-compressed values with their fetch times in the
+    SQLite database in the given directory, so the caches can be warmed up
+    after a restart.
+
+    The database is kept under `max_size` bytes by evicting the least recently
+    used entries. Entries older than `max_age` seconds aren't loaded.
+
+    Objects, which can't be pickled (like clients with HTTP sessions), can be
+    registered with register_external_object(): they are stored as their names
+    and replaced with the registered objects on loading.
+
+    SQLite is used from a separate thread, so the event loop isn't blocked by
+    the disk.
+    """
+
+    def __init__(
+            self, directory: str, max_size: int = PERSISTENT_CACHE_MAX_SIZE,
+            max_age: float = PERSISTENT_CACHE_MAX_AGE,
+            logger: Optional[logging.Logger] = None):
+        os.makedirs(directory, exist_ok=True)
+        self.max_size = max_size
+        self.max_age = max_age
+        self.logger = logger
+        self.stats = PersistentCacheStats()
+        self._external_objects: Dict[str, Any] = {}
+        self._external_ids: Dict[int, str] = {}
+        # One thread, because the connection can't be used concurrently
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self._connection = sqlite3.connect(
+            os.path.join(directory, PERSISTENT_CACHE_FILE_NAME),
+            check_same_thread=False
+        )
+        self._connection.executescript("""
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                fetch_time REAL NOT NULL,
+                access_time REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS entries_by_access_time
+            ON entries (access_time);
+        """)
+        # Size of the values in the database, kept up to date by the saves, so
+        # the eviction runs only when the database is too big
+        self._total_size = self._get_total_size()
+
+    def register_external_object(self, name: str, obj: Any) -> None:
+        self._external_objects[name] = obj
+        self._external_ids[id(obj)] = name
+
+    def serialize(self, value: Any) -> bytes:
+        file = io.BytesIO()
+        _Pickler(file, self._external_ids).dump(value)
+        return zlib.compress(file.getvalue(), COMPRESSION_LEVEL)
+
+    def deserialize(self, data: bytes) -> Any:
+        return _Unpickler(
+            io.BytesIO(zlib.decompress(data)), self._external_objects
+        ).load()
+
+    async def load(self, key: str) -> Optional[Tuple[float, Any]]:
+        """
+        Returns (Unix time of the fetch, value) or None, if there is no fresh
+        enough entry for the key.
+        """
+        entry = await self._run(self._load_entry, key)
+        if entry is None:
+            return None
+        data, fetch_time = entry
+        try:
+            value = self.deserialize(data)
+        except Exception as exc:
+            # Like when the classes were changed since the saving
+            if self.logger is not None:
+                self.logger.warning(
+                    f"Не удалось загрузить \"{key}\" из кэша: {exc!r}"
+                )
+            return None
+        self.stats.loads += 1
+        return fetch_time, value
+
+    async def save(self, key: str, value: Any, fetch_time: float) -> None:
+        """
+        fetch_time is the Unix time of the fetch.
+        """
+        try:
+            data = self.serialize(value)
+        except Exception as exc:
+            self.stats.failed_saves += 1
+            if self.logger is not None:
+                self.logger.warning(
+                    f"Не удалось сохранить \"{key}\" в кэш: {exc!r}"
+                )
+            return
+        await self._run(self._save_entry, key, data, fetch_time)
+        self.stats.saves += 1
+
+    async def close(self) -> None:
+        await self._run(self._connection.close)
+        self._executor.shutdown()
+
+    async def _run(self, function, *args):
+        return await asyncio.get_event_loop().run_in_executor(
+            self._executor, function, *args
+        )
+
+    def _get_total_size(self) -> int:
+        return self._connection.execute(
+            "SELECT COALESCE(SUM(LENGTH(value)), 0) FROM entries"
+        ).fetchone()[0]
+
+    def _load_entry(self, key: str) -> Optional[Tuple[bytes, float]]:
+        with self._connection:
+            entry = self._connection.execute(
+                "SELECT value, fetch_time FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if entry is None:
+                return None
+            if time.time() - entry[1] > self.max_age:
+                self._connection.execute(
+                    "DELETE FROM entries WHERE key = ?", (key,)
+                )
+                self._total_size -= len(entry[0])
+                return None
+            self._connection.execute(
+                "UPDATE entries SET access_time = ? WHERE key = ?",
+                (time.time(), key)
+            )
+            return entry
+
+    def _save_entry(self, key: str, data: bytes, fetch_time: float) -> None:
+        with self._connection:
+            old_entry = self._connection.execute(
+                "SELECT LENGTH(value) FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            self._connection.execute(
+                "INSERT OR REPLACE INTO entries "
+                "(key, value, fetch_time, access_time) VALUES (?, ?, ?, ?)",
+                (key, data, fetch_time, time.time())
+            )
+            self._total_size += len(data) - (
+                0 if old_entry is None else old_entry[0]
+            )
+            if self._total_size <= self.max_size:
+                return
+            # Keeping the most recently used entries, which fit into max_size
+            self._connection.execute("""
+                DELETE FROM entries WHERE key IN (
+                    SELECT key FROM (
+                        SELECT key, SUM(LENGTH(value)) OVER (
+                            ORDER BY access_time DESC, key
+                        ) AS total_size
+                        FROM entries
+                    )
+                    WHERE total_size > ?
+                )
+            """, (self.max_size,))
+            self._total_size = self._get_total_size()
@@ -1,64 +1,193 @@
-from typing import List, Dict, Any
+import asyncio
+import concurrent.futures
+import itertools
+import logging
+from typing import List, Dict, Any, Optional
 
 import aiohttp
-import bs4
 
-POINTERCRATE_DEMONS_LINK = "https://pointercrate.com/api/v2/demons/"
+from requests_workers import mobile_demonlist
+from requests_workers.background_refresher import BackgroundRefresher
+from requests_workers.cache import TTLCache, HTTPDocument
+from requests_workers.dataclasses_ import MobileDemonlist, PCDemonlist
+from requests_workers.links import POINTERCRATE_DEMONS_LINK, MOBILE_DEMONS_LINK
+from requests_workers.persistent_cache import PersistentCache
+
 POINTERCRATE_DEMONS_LIMIT = 100
+POINTERCRATE_DEMONS_AMOUNT = 150
+# Maximum amount of the requests to Pointercrate running at the same time
+POINTERCRATE_CONCURRENCY = 4
+PC_DEMONLIST_REFRESH_INTERVAL = 10 * 60  # In seconds
+# After this time cached demons are revalidated with conditional requests
+PC_DEMON_TTL = 5 * 60  # In seconds
+# The mobile demonlist changes a few times a week
+MOBILE_DEMONLIST_TTL = 30 * 60  # In seconds
 
 
 class RequestsWorker:
 
-    def __init__(self, aiohttp_session: aiohttp.ClientSession):
+    def __init__(
+            self, aiohttp_session: aiohttp.ClientSession,
+            mobile_demonlist_ttl: float = MOBILE_DEMONLIST_TTL,
+            html_parser: str = mobile_demonlist.DEFAULT_HTML_PARSER,
+            parsing_executor: Optional[concurrent.futures.Executor] = None,
+            pc_demonlist_refresh_interval: float = (
+                PC_DEMONLIST_REFRESH_INTERVAL
+            ),
+            pointercrate_concurrency: int = POINTERCRATE_CONCURRENCY,
+            pc_demon_ttl: float = PC_DEMON_TTL,
+            persistent_cache: Optional[PersistentCache] = None,
+            pointercrate_demons_link: str = POINTERCRATE_DEMONS_LINK,
+            mobile_demons_link: str = MOBILE_DEMONS_LINK,
+            logger: Optional[logging.Logger] = None):
+        """
+        parsing_executor runs the CPU-bound parsing of the pages, so it doesn't
+        block the event loop. Process pool is preferred, because threads are
+        limited by the GIL. If it is None, the default executor of the event
+        loop is used.
+
+        If persistent_cache is given, the downloaded data is saved to it and
+        served from it after a restart, while it is revalidated.
+
+        The links can be changed to point the worker at the stand-in servers.
+        """
         self.aiohttp_session = aiohttp_session
+        self.pointercrate_demons_link = pointercrate_demons_link
+        self.mobile_demons_link = mobile_demons_link
+        self.html_parser = html_parser
+        self.parsing_executor = parsing_executor
+        self.pointercrate_semaphore = asyncio.Semaphore(
+            pointercrate_concurrency
+        )
+        self.pc_demons_cache: TTLCache[int, HTTPDocument] = TTLCache(
+            pc_demon_ttl, persistent_cache, namespace="pc_demon:",
+            logger=logger
+        )
+        self.pc_demonlist_refresher: BackgroundRefresher[PCDemonlist] = (
+            BackgroundRefresher(
+                self.download_pc_demonlist,
+                interval=pc_demonlist_refresh_interval,
+                persistent_cache=persistent_cache,
+                persistent_key="pc_demonlist", logger=logger
+            )
+        )
+        self.mobile_demonlist_cache: TTLCache[str, MobileDemonlist] = (
+            TTLCache(
+                mobile_demonlist_ttl, persistent_cache,
+                namespace="mobile_demonlist:", logger=logger
+            )
+        )
 
-    async def get_mobile_demons_site(self) -> bs4.BeautifulSoup:
-        return bs4.BeautifulSoup(
-            await (
-                await self.aiohttp_session.get(
-                    "https://sites.google.com/view/gd-mobile-lists"
-                    "/top-100-demons-completed"
-                )
-            ).text(), "html.parser"
+    async def close(self) -> None:
+        """
+        Stops the background refreshing of the data.
+        """
+        await self.pc_demonlist_refresher.stop()
+
+    async def get_mobile_demonlist(self) -> MobileDemonlist:
+        """
+        Returns the cached snapshot, which is parsed once per page download, so
+        the snapshot shouldn't be changed.
+        """
+        return await self.mobile_demonlist_cache.get(
+            self.mobile_demons_link, self.download_mobile_demonlist
+        )
+
+    async def download_mobile_demonlist(self) -> MobileDemonlist:
+        html = await self.download_mobile_demons_site()
+        demons = await asyncio.get_event_loop().run_in_executor(
+            self.parsing_executor,
+            mobile_demonlist.get_mobile_demons_info_from_html,
+            html, self.html_parser
+        )
+        return MobileDemonlist(
+            demons,
+            previous=self.mobile_demonlist_cache.get_stale(
+                self.mobile_demons_link
+            )
+        )
+
+    async def download_mobile_demons_site(self) -> str:
+        return await (
+            await self.aiohttp_session.get(self.mobile_demons_link)
+        ).text()
+
+    async def get_pc_demonlist(self) -> PCDemonlist:
+        """
+        Returns the snapshot of the top POINTERCRATE_DEMONS_AMOUNT demons, which
+        is refreshed in the background, so the snapshot shouldn't be changed.
+        """
+        return await self.pc_demonlist_refresher.get()
+
+    async def download_pc_demonlist(self) -> PCDemonlist:
+        return PCDemonlist(
+            await self.get_pc_demonlist_as_json(POINTERCRATE_DEMONS_AMOUNT),
+            previous=self.pc_demonlist_refresher.get_current()
         )
 
     async def get_pc_demonlist_as_json(
             self, demons_amount: int) -> List[dict]:
-        first_part = await self.aiohttp_session.get(
-            POINTERCRATE_DEMONS_LINK,
-            params={"limit": min(demons_amount, POINTERCRATE_DEMONS_LIMIT)}
-            # Pointercrate isn't allowing to go above the limit
-        )
-        if demons_amount > POINTERCRATE_DEMONS_LIMIT:
-            second_part = await self.aiohttp_session.get(
-                POINTERCRATE_DEMONS_LINK,
-                params={
-                    "after": POINTERCRATE_DEMONS_LIMIT,
-                    "limit": demons_amount - POINTERCRATE_DEMONS_LIMIT
-                }
-                # Getting remaining demons
+        """
+        Splits the demons into pages of POINTERCRATE_DEMONS_LIMIT demons
+        (Pointercrate isn't allowing to go above the limit), fetches them
+        concurrently and joins them in order.
+        """
+        pages = await asyncio.gather(*(
+            self.get_pc_demonlist_page_as_json(
+                after=after,
+                limit=min(POINTERCRATE_DEMONS_LIMIT, demons_amount - after)
             )
-            return await first_part.json() + await second_part.json()
-        return await first_part.json()
+            for after in range(0, demons_amount, POINTERCRATE_DEMONS_LIMIT)
+        ))
+        return list(itertools.chain.from_iterable(pages))
 
-    async def get_pc_demon_as_json(self, demon_num: int) -> Dict[str, Any]:
-        return (await (await self.aiohttp_session.get(
-            f"{POINTERCRATE_DEMONS_LINK}/{demon_num}"
-        )).json())["data"]
+    async def get_pc_demonlist_page_as_json(
+            self, after: int, limit: int) -> List[dict]:
+        params = {"limit": limit}
+        if after:
+            params["after"] = after
+        async with self.pointercrate_semaphore:
+            return await (await self.aiohttp_session.get(
+                self.pointercrate_demons_link, params=params
+            )).json()
 
+    async def get_pc_demon_as_json(self, demon_num: int) -> Dict[str, Any]:
+        """
+        Returns the cached demon, so the dict shouldn't be changed.
+        """
+        return (await self.pc_demons_cache.get(
+            demon_num, lambda: self.download_pc_demon(demon_num)
+        )).data
 
-if __name__ == '__main__':
-    import asyncio
-    from handlers import handler_helpers
+    async def download_pc_demon(self, demon_num: int) -> HTTPDocument:
+        """
+        If the demon is cached, but expired, it is revalidated with a
+        conditional request, so the unchanged demon isn't transferred again.
+        """
+        stale_document = self.pc_demons_cache.get_stale(demon_num)
+        async with self.pointercrate_semaphore:
+            response = await self.aiohttp_session.get(
+                f"{self.pointercrate_demons_link}/{demon_num}",
+                headers=(
+                    None if stale_document is None
+                    else stale_document.get_conditional_headers()
+                )
+            )
+            if response.status == 304 and stale_document is not None:
+                self.pc_demons_cache.stats.revalidations += 1
+                return stale_document
+            return HTTPDocument(
+                data=(await response.json())["data"],
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified")
+            )
 
 
+if __name__ == '__main__':
     async def main():
         async with aiohttp.ClientSession() as session:
             rw = RequestsWorker(session)
-            site = await rw.get_mobile_demons_site()
-            for demon_info in (
-                handler_helpers.get_mobile_demons_info_from_soup(site)
-            ):
+            for demon_info in (await rw.get_mobile_demonlist()).demons:
                 print(demon_info)
 
 
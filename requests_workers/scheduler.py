@@ -0,0 +1,193 @@
+import asyncio
+import collections
+import enum
+import heapq
+import itertools
+import statistics
+import time
+from dataclasses import dataclass, field
+from typing import (
+    Awaitable, Callable, Deque, Dict, List, Optional, Tuple, TypeVar
+)
+
+ResultType = TypeVar("ResultType")
+
+# Amount of the last queue waits used for the percentiles
+QUEUE_WAIT_SAMPLES_AMOUNT = 1000
+
+
+class Priority(enum.IntEnum):
+    """
+    Lower values go first.
+    """
+
+    # Requests, without which the command can't be answered
+    PRIMARY = 0
+    # Requests for the optional parts of the answers (comments, levels of the
+    # player, passwords)
+    OPTIONAL = 1
+    # Speculative requests, which no one is waiting for; they are shed under
+    # pressure (see PriorityScheduler)
+    PREFETCH = 2
+
+
+class CallShed(Exception):
+    """
+    Raised from PriorityScheduler.run() instead of calling the function, if the
+    call was dropped because of the pressure.
+    """
+
+
+@dataclass
+class SchedulerStats:
+    calls: Dict[Priority, int] = field(
+        default_factory=lambda: dict.fromkeys(Priority, 0)
+    )
+    # In seconds
+    total_queue_wait: float = 0
+    max_queue_wait: float = 0
+    # PREFETCH calls dropped under pressure
+    shed_calls: int = 0
+    last_queue_waits: Deque[float] = field(
+        default_factory=lambda: collections.deque(
+            maxlen=QUEUE_WAIT_SAMPLES_AMOUNT
+        )
+    )
+
+    def add_queue_wait(self, queue_wait: float) -> None:
+        self.total_queue_wait += queue_wait
+        self.max_queue_wait = max(self.max_queue_wait, queue_wait)
+        self.last_queue_waits.append(queue_wait)
+
+    def get_queue_wait_percentiles(self) -> Dict[str, float]:
+        """
+        Returns p50, p90 and p99 of the last queue waits in seconds (zeros,
+        if there were less than two calls).
+        """
+        if len(self.last_queue_waits) < 2:
+            return {"p50": 0, "p90": 0, "p99": 0}
+        quantiles = statistics.quantiles(
+            self.last_queue_waits, n=100, method="inclusive"
+        )
+        return {
+            "p50": quantiles[49], "p90": quantiles[89], "p99": quantiles[98]
+        }
+
+
+class PriorityScheduler:
+    """
+    Runs the calls to an upstream with at most `concurrency` calls at the same
+    time and at most `rate` calls per second on average (token bucket with
+    `burst` tokens). Waiting calls are started in the order of their
+    priorities (see Priority), then in the order of their arrival.
+
+    If shedding_threshold is given, the waiting PREFETCH calls are dropped
+    (with CallShed), when more calls than that are waiting, so the speculative
+    calls don't take the limits from the users under pressure.
+    """
+
+    def __init__(
+            self, rate: float, burst: int, concurrency: int,
+            shedding_threshold: Optional[int] = None):
+        self.rate = rate
+        self.burst = burst
+        self.concurrency = concurrency
+        self.shedding_threshold = shedding_threshold
+        self.stats = SchedulerStats()
+        self.running_amount = 0
+        self._tokens = float(burst)
+        self._tokens_update_time = time.monotonic()
+        # (priority, arrival number, future of the start)
+        self._waiters: List[Tuple[Priority, int, asyncio.Future]] = []
+        self._arrival_numbers = itertools.count()
+        self._dispatch_timer: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def waiting_amount(self) -> int:
+        return sum(not waiter[2].done() for waiter in self._waiters)
+
+    async def run(
+            self, function: Callable[[], Awaitable[ResultType]],
+            priority: Priority = Priority.PRIMARY) -> ResultType:
+        """
+        Calls the function, when the limits allow it, and returns its result.
+
+        Raises:
+            CallShed:
+                if the call has the PREFETCH priority and was dropped under
+                pressure
+        """
+        await self._acquire(priority)
+        try:
+            return await function()
+        finally:
+            self.running_amount -= 1
+            self._dispatch()
+
+    async def _acquire(self, priority: Priority) -> None:
+        self.stats.calls[priority] += 1
+        arrival_time = time.monotonic()
+        start = asyncio.get_event_loop().create_future()
+        heapq.heappush(
+            self._waiters, (priority, next(self._arrival_numbers), start)
+        )
+        self._dispatch()
+        if (
+            self.shedding_threshold is not None
+            and self.waiting_amount > self.shedding_threshold
+        ):
+            self._shed()
+        try:
+            await start
+        except asyncio.CancelledError:
+            if (
+                start.done() and not start.cancelled()
+                and start.exception() is None  # Shed calls weren't allowed
+            ):
+                # The call was allowed right before the cancellation
+                self.running_amount -= 1
+                self._dispatch()
+            raise
+        self.stats.add_queue_wait(time.monotonic() - arrival_time)
+
+    def _shed(self) -> None:
+        for priority, _arrival_number, start in self._waiters:
+            if priority >= Priority.PREFETCH and not start.done():
+                start.set_exception(CallShed())
+                self.stats.shed_calls += 1
+
+    def _update_tokens(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(
+            self.burst,
+            self._tokens + (now - self._tokens_update_time) * self.rate
+        )
+        self._tokens_update_time = now
+
+    def _dispatch(self) -> None:
+        """
+        Allows the waiting calls to start, while the limits allow it.
+        """
+        self._update_tokens()
+        while self._waiters and self.running_amount < self.concurrency:
+            _priority, _arrival_number, start = self._waiters[0]
+            if start.done():  # Cancelled or shed
+                heapq.heappop(self._waiters)
+                continue
+            if self._tokens < 1:
+                if self._dispatch_timer is None:
+                    self._dispatch_timer = (
+                        asyncio.get_event_loop().call_later(
+                            (1 - self._tokens) / self.rate,
+                            self._dispatch_by_timer
+                        )
+                    )
+                return
+            heapq.heappop(self._waiters)
+            self._tokens -= 1
+            self.running_amount += 1
+            start.set_result(None)
+
+    def _dispatch_by_timer(self) -> None:
+        self._dispatch_timer = None
+        self._dispatch()
@@ -0,0 +1,133 @@
+import heapq
+from collections import Counter
+from typing import Dict, FrozenSet, Iterable, List, Set
+
+import utils
+
+# Names, which share less than this part of their trigrams with the searched
+# name, aren't suggested
+MIN_SIMILARITY = 0.3
+SIMILAR_NAMES_LIMIT = 3
+
+
+def get_trigrams(normalized_name: str) -> FrozenSet[str]:
+    """
+    Returns the trigrams of the name, padded with spaces, so short names and
+    the beginnings of the names are weighted too.
+    """
+    padded_name = f"  {normalized_name} "
+    return frozenset(
+        padded_name[index:index + 3] for index in range(len(padded_name) - 2)
+    )
+
+
+class TrigramIndex:
+    """
+    Index of the names by their trigrams (see get_trigrams) for the fuzzy
+    search of the names.
+
+    The index isn't changed after creation, so it can be shared between the
+    snapshots; get_updated() makes the index for the new names, reusing the
+    unchanged parts of the old one.
+    """
+
+    def __init__(self, names: Iterable[str] = ()):
+        # Normalized name -> original name
+        self.names: Dict[str, str] = {}
+        self.trigrams_by_name: Dict[str, FrozenSet[str]] = {}
+        self.names_by_trigram: Dict[str, Set[str]] = {}
+        self._add_names(self._get_normalized_names(names))
+
+    @staticmethod
+    def _get_normalized_names(names: Iterable[str]) -> Dict[str, str]:
+        normalized_names = {}
+        for name in names:
+            # The first name wins, as in the snapshots
+            normalized_names.setdefault(utils.normalize_demon_name(name), name)
+        return normalized_names
+
+    def _add_names(self, normalized_names: Dict[str, str]) -> None:
+        for normalized_name, name in normalized_names.items():
+            trigrams = get_trigrams(normalized_name)
+            self.names[normalized_name] = name
+            self.trigrams_by_name[normalized_name] = trigrams
+            for trigram in trigrams:
+                self.names_by_trigram.setdefault(trigram, set()).add(
+                    normalized_name
+                )
+
+    def get_updated(self, names: Iterable[str]) -> "TrigramIndex":
+        """
+        Returns the index of the given names. Only the names, which were added
+        or removed, are reindexed, and only the posting sets of their trigrams
+        are copied, so this index stays unchanged.
+        """
+        new_names = self._get_normalized_names(names)
+        removed_names = self.names.keys() - new_names.keys()
+        added_names = {
+            normalized_name: name
+            for normalized_name, name in new_names.items()
+            if normalized_name not in self.names
+        }
+        index = TrigramIndex()
+        index.names = {
+            normalized_name: new_names[normalized_name]
+            for normalized_name in self.names
+            if normalized_name not in removed_names
+        }
+        index.trigrams_by_name = {
+            normalized_name: trigrams
+            for normalized_name, trigrams in self.trigrams_by_name.items()
+            if normalized_name not in removed_names
+        }
+        index.names_by_trigram = dict(self.names_by_trigram)
+        changed_trigrams = set()
+        for normalized_name in removed_names:
+            changed_trigrams.update(self.trigrams_by_name[normalized_name])
+        for normalized_name in added_names:
+            changed_trigrams.update(get_trigrams(normalized_name))
+        for trigram in changed_trigrams:
+            index.names_by_trigram[trigram] = set(
+                self.names_by_trigram.get(trigram, ())
+            )
+        for normalized_name in removed_names:
+            for trigram in self.trigrams_by_name[normalized_name]:
+                index.names_by_trigram[trigram].discard(normalized_name)
+        index._add_names(added_names)
+        for trigram in changed_trigrams:
+            if not index.names_by_trigram[trigram]:
+                del index.names_by_trigram[trigram]
+        return index
+
+    def get_similar_names(
+            self, name: str, limit: int = SIMILAR_NAMES_LIMIT,
+            min_similarity: float = MIN_SIMILARITY) -> List[str]:
+        """
+        Returns up to `limit` original names, which are the most similar to the
+        given one (by the Jaccard similarity of their trigrams), the most
+        similar first.
+        """
+        trigrams = get_trigrams(utils.normalize_demon_name(name))
+        common_trigrams_amounts = Counter()
+        for trigram in trigrams:
+            common_trigrams_amounts.update(
+                self.names_by_trigram.get(trigram, ())
+            )
+        similarities = []
+        for normalized_name, common_trigrams_amount in (
+                common_trigrams_amounts.items()):
+            similarity = common_trigrams_amount / (
+                len(trigrams) + len(self.trigrams_by_name[normalized_name])
+                - common_trigrams_amount
+            )
+            if similarity >= min_similarity:
+                similarities.append((similarity, normalized_name))
+        return [
+            self.names[normalized_name]
+            for _similarity, normalized_name in heapq.nsmallest(
+                limit, similarities,
+                key=lambda similarity_and_name: (
+                    -similarity_and_name[0], similarity_and_name[1]
+                )
+            )
+        ]
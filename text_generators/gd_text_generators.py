@@ -1,11 +1,70 @@
+import asyncio
+from typing import Awaitable, Callable, Optional
+
 import gd
 
 import utils
+from requests_workers.scheduler import PriorityScheduler, Priority
 
 STARS_WORDS = ("звезда", "звезды", "звезд")
+# How long the optional parts of the messages (comments, levels of the player,
+# password) are waited for
+OPTIONAL_PART_TIMEOUT = 5  # In seconds
+# Errors of the optional parts, which don't fail the whole message
+OPTIONAL_PART_ERRORS = (gd.GDException, IndexError, asyncio.TimeoutError)
+
+
+async def get_optional_part(
+        coroutine: Awaitable[str], timeout: float = OPTIONAL_PART_TIMEOUT
+        ) -> str:
+    """
+    Returns the part of the message made by the coroutine or an empty string,
+    if the coroutine fails with OPTIONAL_PART_ERRORS or takes more than
+    `timeout` seconds, so the optional parts don't fail the whole message.
+    """
+    try:
+        return await asyncio.wait_for(coroutine, timeout)
+    except OPTIONAL_PART_ERRORS:
+        return ""
+
+
+def schedule_optional_part(
+        scheduler: Optional[PriorityScheduler],
+        function: Callable[[], Awaitable[str]]) -> Awaitable[str]:
+    """
+    Optional parts are requested after the primary requests of the other
+    commands, which are waiting in the scheduler.
+    """
+    if scheduler is None:
+        return function()
+    return scheduler.run(function, Priority.OPTIONAL)
+
+
+async def get_last_user_post_str(user: gd.User) -> str:
+    return (
+        f"\n\n- Последний пост игрока: "
+        f"\"{(await user.get_page_comments())[0].body}\""
+    )
+
+
+async def get_last_user_levels_str(user: gd.User) -> str:
+    level_names = [
+        level.name for level in (await user.get_levels_on_page())[0:3]
+    ]
+    if not level_names:
+        return ""
+    level_names_str = "\n".join(
+        f"{level_number}) \"{level_name}\""
+        for level_number, level_name in enumerate(level_names, start=1)
+    )
+    return f"\n\n- Последние 3 уровня игрока:\n{level_names_str}"
 
 
-async def get_user_as_readable_string(user: gd.User) -> str:
+async def get_user_as_readable_string(
+        user: gd.User, scheduler: Optional[PriorityScheduler] = None) -> str:
+    """
+    Requests of the optional parts go through the scheduler, if it is given.
+    """
     if user.role == gd.StatusLevel.MODERATOR:
         role = " [МОДЕРАТОР]"
     elif user.role == gd.StatusLevel.ELDER_MODERATOR:
@@ -13,30 +72,15 @@ async def get_user_as_readable_string(user: gd.User) -> str:
     else:
         role = ""
     creator_points_str = f"\n- Очков создания: {user.cp}\n" if user.cp else ""
-    try:
-        last_user_post_str = (
-            f"\n\n- Последний пост игрока: "
-            f"\"{(await user.get_page_comments())[0].body}\""
-        )
-    except (gd.NothingFound, IndexError):
-        last_user_post_str = ""
-    try:
-        level_names = (
-            level.name for level in (await user.get_levels_on_page())[0:3]
-        )
-    except gd.MissingAccess:
-        last_user_levels_str = ""
-    else:
-        if level_names:
-            level_names_str = "\n".join(
-                f"{level_number}) \"{level_name}\""
-                for level_number, level_name in enumerate(level_names, start=1)
-            )
-            last_user_levels_str = (
-                f"\n\n- Последние 3 уровня игрока:\n{level_names_str}"
-            )
-        else:
-            last_user_levels_str = ""
+    # Independent requests, so they are made concurrently
+    last_user_post_str, last_user_levels_str = await asyncio.gather(
+        get_optional_part(schedule_optional_part(
+            scheduler, lambda: get_last_user_post_str(user)
+        )),
+        get_optional_part(schedule_optional_part(
+            scheduler, lambda: get_last_user_levels_str(user)
+        ))
+    )
     return (
         f"• Игрок {user.name}{role}:\n"
         f"\n"
@@ -51,13 +95,70 @@ async def get_user_as_readable_string(user: gd.User) -> str:
     )
 
 
+async def get_most_liked_comments_str(level: gd.Level) -> str:
+    top_three_comments = (
+        await level.get_comments(gd.CommentStrategy.MOST_LIKED)
+    )[0:3]
+    if not top_three_comments:
+        return ""
+    top_three_comments_as_strings = []
+    for position, comment in enumerate(top_three_comments, start=1):
+        percentage_parenthesis = (
+            f" ({comment.level_percentage}%)"
+        ) if comment.level_percentage > 0 else ""
+        top_three_comments_as_strings.append(
+            f"{position}) \"{comment.body}\" от {comment.author.name}"
+            f"{percentage_parenthesis}"
+        )
+    return (
+        "\n\nТоп 3 коммента:\n{}".format(
+            '\n'.join(top_three_comments_as_strings)
+        )  # Using format because Python don't like backslashes in f-strings
+    )
+
+
+async def get_optional_full_level(
+        get_full_level: Callable[[], Awaitable[gd.Level]],
+        timeout: float = OPTIONAL_PART_TIMEOUT) -> Optional[gd.Level]:
+    """
+    Like get_optional_part, but returns None instead of an empty string.
+    """
+    try:
+        return await asyncio.wait_for(get_full_level(), timeout)
+    except OPTIONAL_PART_ERRORS:
+        return None
+
+
 async def get_level_as_readable_string(
-        level: gd.Level, level_is_refreshed: bool = False) -> str:
+        level: gd.Level, scheduler: Optional[PriorityScheduler] = None,
+        get_full_level: Optional[Callable[[], Awaitable[gd.Level]]] = None
+        ) -> str:
     """
-    level_is_refreshed means that `await level.refresh()` is used.
-    You need to refresh a level to get its password (and other data, which isn't
-    needed for this function)
+    get_full_level should be given, if the level isn't full (like the levels
+    from the search results), because the full level is needed to get its
+    password (and other data, which isn't needed for this function).
+    get_full_level should limit its requests itself (like
+    GDWorker.get_full_level), so it isn't run through the scheduler.
+
+    Comments and the full level are independent requests, so they are made
+    concurrently (comments through the scheduler, if it is given). If getting
+    of the full level fails, the password is just omitted.
     """
+    if get_full_level is None:
+        most_liked_comments_str = await get_optional_part(
+            schedule_optional_part(
+                scheduler, lambda: get_most_liked_comments_str(level)
+            )
+        )
+    else:
+        most_liked_comments_str, full_level = await asyncio.gather(
+            get_optional_part(schedule_optional_part(
+                scheduler, lambda: get_most_liked_comments_str(level)
+            )),
+            get_optional_full_level(get_full_level)
+        )
+        if full_level is not None:
+            level = full_level
     description_str = (
         f"Описание: \"{level.description}\""
     ) if level.description else "Описание отсутствует"
@@ -65,29 +166,6 @@ async def get_level_as_readable_string(
     likes_amount_str = (
         f'Дизлайков: {-rating}'
     ) if rating < 0 else f'Лайков: {rating}'
-    top_three_comments = (
-        await level.get_comments(gd.CommentStrategy.MOST_LIKED)
-    )[0:3]
-    if top_three_comments:
-        top_three_comments_as_strings = []
-        for position, comment in enumerate(top_three_comments, start=1):
-            percentage_parenthesis = (
-                f" ({comment.level_percentage}%)"
-            ) if comment.level_percentage > 0 else ""
-            top_three_comments_as_strings.append(
-                f"{position}) \"{comment.body}\" от {comment.author.name}"
-                f"{percentage_parenthesis}"
-            )
-        most_liked_comments_str = (
-            "\n\nТоп 3 коммента:\n{}".format(
-                '\n'.join(top_three_comments_as_strings)
-            )  # Using format because Python don't like backslashes in f-strings
-        )
-    else:
-        most_liked_comments_str = ""
-    if not level_is_refreshed:
-        # To get a password (and other data, which I don't need)
-        await level.refresh()
     password_str = (
         f"- Пароль: {level.password}\n"
     ) if level.password else ""
@@ -1,4 +1,10 @@
-from typing import Tuple
+import asyncio
+import logging
+import unicodedata
+from typing import Tuple, Optional, Callable
+
+# Quotes, which users put around names
+QUOTES = "\"'«»„“”‘’`"
 
 
 def get_plural(num: int, words: Tuple[str, str, str]) -> str:
@@ -14,3 +20,29 @@ def get_plural(num: int, words: Tuple[str, str, str]) -> str:
         return words[1]
     else:
         return words[2]
+
+
+def normalize_demon_name(name: str) -> str:
+    """
+    Makes demon names comparable: trims spaces and quotes around the name,
+    unifies the Unicode representation and case-folds it (casefold() is
+    Unicode-aware, unlike lower()).
+    """
+    return unicodedata.normalize(
+        "NFKC", name.strip().strip(QUOTES).strip()
+    ).casefold()
+
+
+def get_background_error_logger(
+        logger: Optional[logging.Logger],
+        message: str) -> Callable[[asyncio.Future], None]:
+    """
+    Returns a done callback for the futures, which no one awaits. It retrieves
+    the exception, so asyncio doesn't complain about it, and logs it as a
+    warning after the message and a colon.
+    """
+    def log_background_error(future: asyncio.Future) -> None:
+        if not future.cancelled() and future.exception() is not None:
+            if logger is not None:
+                logger.warning(f"{message}: {future.exception()!r}")
+    return log_background_error
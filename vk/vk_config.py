@@ -1,14 +1,22 @@
 import configparser
+from typing import Any
 
 
 # Unpacking vk_secrets.ini
 
-_secret_config = configparser.ConfigParser()
-_secret_config.read("vk/config/vk_secrets.ini", "utf-8")
 # WARNING: vk_secrets.ini is not in the git, so you need to create it
+# TOKEN and GROUP_ID are read on the first access, so the modules, which don't
+# connect to VK (like the benchmarks), can be imported without vk_secrets.ini
 
-TOKEN = _secret_config["SECRETS"]["token"]
-GROUP_ID = int(_secret_config["SECRETS"]["group_id"])
+
+def __getattr__(name: str) -> Any:
+    if name not in ("TOKEN", "GROUP_ID"):
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    secret_config = configparser.ConfigParser()
+    secret_config.read("vk/config/vk_secrets.ini", "utf-8")
+    globals()["TOKEN"] = secret_config["SECRETS"]["token"]
+    globals()["GROUP_ID"] = int(secret_config["SECRETS"]["group_id"])
+    return globals()[name]
 
 
 # Unpacking vk_constants.ini
@@ -18,6 +26,11 @@ _constants_config.read("vk/config/vk_constants.ini", "utf-8")
 
 SYMBOLS_PER_MESSAGE = int(_constants_config["MESSAGES"]["symbols_limit"])
 DEBUG_CHAT_PEER_ID = int(_constants_config["ERRORS"]["debug_chat_peer_id"])
+REQUESTS_PER_SECOND = float(
+    _constants_config["LIMITS"]["requests_per_second"]
+)
+REQUESTS_BURST = int(_constants_config["LIMITS"]["requests_burst"])
+SEND_QUEUE_LIMIT = int(_constants_config["LIMITS"]["send_queue_limit"])
 
 
 # Unpacking bot_info.txt
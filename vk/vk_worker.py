@@ -1,20 +1,179 @@
+import asyncio
+import collections
+import itertools
+import json
 import logging
 import random
-from typing import Optional, AsyncGenerator, Any
+import statistics
+import time
+from dataclasses import dataclass, field
+from typing import Optional, AsyncGenerator, Any, List, Dict, Deque
 
-from simple_avk import SimpleAVK
+from simple_avk import SimpleAVK, MethodError
 
+from requests_workers.scheduler import PriorityScheduler
 from vk import vk_config
 from vk.dataclasses_ import Message
 
+# VK allows up to 25 API calls in one "execute" call
+EXECUTE_CALLS_LIMIT = 25
+# Limit of the length of the "execute" code, so the requests aren't too big
+EXECUTE_CODE_LENGTH_LIMIT = 60_000
+# "Too many requests per second"
+RATE_LIMIT_ERROR_CODES = (6,)
+# Calls failed because of the rate limit are retried after this delay, which
+# is doubled with every retry
+RATE_LIMIT_RETRY_DELAY = 0.5  # In seconds
+RATE_LIMIT_RETRIES = 3
+# Amount of the last send latencies used for the percentiles
+SEND_LATENCY_SAMPLES_AMOUNT = 1000
+
+
+@dataclass
+class VKSendStats:
+    # Parts of the messages (see vk_config.SYMBOLS_PER_MESSAGE) sent
+    sent_parts: int = 0
+    execute_calls: int = 0
+    # messages.send calls (without the "execute" ones)
+    single_calls: int = 0
+    # Parts sent one by one, because their "execute" call has failed
+    fallback_parts: int = 0
+    # Calls repeated because of the rate limit errors
+    rate_limit_retries: int = 0
+    max_queue_depth: int = 0
+    # Times, when the new commands were waiting for the send queue
+    back_pressure_waits: int = 0
+    # From the queueing of the part to its sending, in seconds
+    last_send_latencies: Deque[float] = field(
+        default_factory=lambda: collections.deque(
+            maxlen=SEND_LATENCY_SAMPLES_AMOUNT
+        ), repr=False
+    )
+
+    def get_send_latency_percentiles(self) -> Dict[str, float]:
+        """
+        Returns p50, p90 and p99 of the last send latencies in seconds (zeros,
+        if there were less than two sends).
+        """
+        if len(self.last_send_latencies) < 2:
+            return {"p50": 0, "p90": 0, "p99": 0}
+        quantiles = statistics.quantiles(
+            self.last_send_latencies, n=100, method="inclusive"
+        )
+        return {
+            "p50": quantiles[49], "p90": quantiles[89], "p99": quantiles[98]
+        }
+
+
+class UnexpectedExecuteResponse(Exception):
+    pass
+
+
+@dataclass
+class _PendingSend:
+    params: Dict[str, Any]
+    future: asyncio.Future
+    queueing_time: float
+    # Futures of every part of the message (with this one), in order
+    message_futures: List[asyncio.Future]
+
+    @property
+    def is_cancelled(self) -> bool:
+        # The future is cancelled, if the reply was cancelled or if the
+        # previous part of the message has failed
+        return self.future.cancelled()
+
+    def set_result(self) -> None:
+        if not self.future.done():
+            self.future.set_result(None)
+
+    def set_exception(self, exception: Exception) -> None:
+        if not self.future.done():
+            self.future.set_exception(exception)
+        # The next parts of the message aren't sent after the failed one
+        for future in self.message_futures:
+            future.cancel()
+
+
+def get_execute_code(sends_params: List[Dict[str, Any]]) -> str:
+    """
+    Makes the VKScript code, which calls messages.send with every params in
+    order and returns the list of the results. The calls after the first
+    failed one aren't made, so the list ends with the first False, if there
+    is one. Every call is on its own line.
+    """
+    lines = ["var results = [];"]
+    for call_num, params in enumerate(sends_params):
+        lines.append(
+            f"results.push(API.messages.send("
+            f"{json.dumps(params, ensure_ascii=False)}));"
+        )
+        lines.append(f"if (!results[{call_num}]) {{ return results; }}")
+    lines.append("return results;")
+    return "\n".join(lines)
+
+
+def is_valid_execute_response(response: Any, calls_amount: int) -> bool:
+    """
+    Checks, that the response is like the result of the code made by
+    get_execute_code() for calls_amount calls.
+    """
+    if not isinstance(response, list) or not 0 < len(response) <= calls_amount:
+        return False
+    if False in response[:-1]:
+        return False
+    return len(response) == calls_amount or response[-1] is False
+
 
 class VKWorker:
 
     def __init__(
             self, simple_avk: SimpleAVK,
-            logger: Optional[logging.Logger] = None):
+            logger: Optional[logging.Logger] = None,
+            batch_size: int = EXECUTE_CALLS_LIMIT,
+            requests_per_second: float = vk_config.REQUESTS_PER_SECOND,
+            requests_burst: int = vk_config.REQUESTS_BURST,
+            send_queue_limit: int = vk_config.SEND_QUEUE_LIMIT):
+        """
+        Replies are put to one outbound queue. Replies, which are ready at the
+        same time (and the parts of the long replies), are sent with "execute"
+        calls of up to batch_size messages.send calls. Batches are sent one
+        after another and the calls in a batch are made in order, so the
+        messages to every peer keep their order. If a call in a batch fails,
+        the next calls aren't made and are sent after it. The next parts of
+        a message aren't sent after its failed part. If batch_size is 1, every
+        part is sent with its own messages.send call.
+
+        The calls are limited to requests_per_second (with bursts of
+        requests_burst calls) and are retried after the rate limit errors.
+        When more than send_queue_limit parts are waiting,
+        wait_for_send_queue() waits until the queue is half as long.
+        """
         self.vk = simple_avk
         self.logger = logger
+        self.batch_size = min(batch_size, EXECUTE_CALLS_LIMIT)
+        self.send_queue_limit = send_queue_limit
+        self.send_stats = VKSendStats()
+        self.send_scheduler = PriorityScheduler(
+            requests_per_second, requests_burst, concurrency=1
+        )
+        self._pending_sends: Deque[_PendingSend] = collections.deque()
+        self._sending: Optional[asyncio.Future] = None
+        self._send_queue_has_room = asyncio.Event()
+        self._send_queue_has_room.set()
+
+    @property
+    def send_queue_depth(self) -> int:
+        return len(self._pending_sends)
+
+    async def wait_for_send_queue(self) -> None:
+        """
+        Waits while the send queue is too long, so the new commands don't make
+        it even longer.
+        """
+        if not self._send_queue_has_room.is_set():
+            self.send_stats.back_pressure_waits += 1
+            await self._send_queue_has_room.wait()
 
     async def listen_for_messages(self) -> AsyncGenerator[Any, None]:
         async for event in self.vk.listen():
@@ -28,24 +187,164 @@ class VKWorker:
                 yield message_info
 
     async def reply(self, message: Message) -> None:
+        """
+        Can throw simple_avk.MethodError (the first error of the message
+        parts; the next parts aren't sent) and UnexpectedExecuteResponse
+        """
         text_parts = (
             message.text[i:i + vk_config.SYMBOLS_PER_MESSAGE]
             for i in range(0, len(message.text), vk_config.SYMBOLS_PER_MESSAGE)
         )
+        loop = asyncio.get_event_loop()
+        futures: List[asyncio.Future] = []
         for part in text_parts:
+            future = loop.create_future()
             # noinspection SpellCheckingInspection
-            await self.vk.call_method(
-                "messages.send",
+            self._pending_sends.append(_PendingSend(
                 {
                     "peer_id": message.peer_id,
                     "message": part,
                     "random_id": random.randint(-1_000_000, 1_000_000),
                     "disable_mentions": 1,
                     "dont_parse_links": 1
-                }
-            )
+                },
+                future, time.monotonic(), futures
+            ))
+            futures.append(future)
+        self.send_stats.max_queue_depth = max(
+            self.send_stats.max_queue_depth, len(self._pending_sends)
+        )
+        if len(self._pending_sends) > self.send_queue_limit:
+            self._send_queue_has_room.clear()
+        if self._sending is None:
+            self._sending = asyncio.ensure_future(self._send_pending())
+        # The parts after the failed one are cancelled, so every exception is
+        # retrieved
+        results = await asyncio.gather(*futures, return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
         if self.logger is not None:
             self.logger.debug(
                 f"Отправлено сообщение в чат с peer_id {message.peer_id}: "
                 f"{message.text}"
             )
+
+    async def _send_pending(self) -> None:
+        try:
+            # Letting the other replies, which are ready, join the batch
+            await asyncio.sleep(0)
+            while self._pending_sends:
+                batch = self._take_batch()
+                if not batch:  # Every part was cancelled
+                    break
+                if len(batch) == 1:
+                    await self._send_single(batch[0])
+                else:
+                    await self._send_batch(batch)
+        finally:
+            self._sending = None
+
+    def _take_batch(self) -> List[_PendingSend]:
+        batch: List[_PendingSend] = []
+        code_length = 0
+        while self._pending_sends and len(batch) < self.batch_size:
+            if self._pending_sends[0].is_cancelled:
+                self._pending_sends.popleft()
+                continue
+            code_length += len(
+                get_execute_code([self._pending_sends[0].params])
+            )
+            if batch and code_length > EXECUTE_CODE_LENGTH_LIMIT:
+                break
+            batch.append(self._pending_sends.popleft())
+        if len(self._pending_sends) <= self.send_queue_limit // 2:
+            self._send_queue_has_room.set()
+        return batch
+
+    async def _call_method(self, method_name: str, params: dict) -> Any:
+        """
+        Calls the method within the rate limit, retrying it after the rate
+        limit errors.
+        """
+        for retry_num in itertools.count():
+            try:
+                return await self.send_scheduler.run(
+                    lambda: self.vk.call_method(method_name, params)
+                )
+            except MethodError as exc:
+                if (
+                    exc.error_code not in RATE_LIMIT_ERROR_CODES
+                    or retry_num == RATE_LIMIT_RETRIES
+                ):
+                    raise
+                self.send_stats.rate_limit_retries += 1
+                await asyncio.sleep(RATE_LIMIT_RETRY_DELAY * 2 ** retry_num)
+
+    def _mark_as_sent(self, pending_send: _PendingSend) -> None:
+        self.send_stats.sent_parts += 1
+        self.send_stats.last_send_latencies.append(
+            time.monotonic() - pending_send.queueing_time
+        )
+        pending_send.set_result()
+
+    async def _send_single(self, pending_send: _PendingSend) -> None:
+        self.send_stats.single_calls += 1
+        try:
+            await self._call_method("messages.send", pending_send.params)
+        except Exception as exc:
+            pending_send.set_exception(exc)
+        else:
+            self._mark_as_sent(pending_send)
+
+    async def _send_batch(self, batch: List[_PendingSend]) -> None:
+        self.send_stats.execute_calls += 1
+        try:
+            results = await self._call_method("execute", {
+                "code": get_execute_code(
+                    [pending_send.params for pending_send in batch]
+                )
+            })
+        except MethodError as exc:
+            # Like when the request is too big; the calls weren't made
+            if self.logger is not None:
+                self.logger.warning(
+                    f"Не удалось отправить сообщения через execute, они будут "
+                    f"отправлены по одному: {exc}"
+                )
+            for pending_send in batch:
+                # Skipping the parts after the failed part of their message
+                if not pending_send.is_cancelled:
+                    self.send_stats.fallback_parts += 1
+                    await self._send_single(pending_send)
+            return
+        except Exception as exc:
+            # Like network errors; it is unknown, which calls were made
+            for pending_send in batch:
+                pending_send.set_exception(exc)
+            return
+        if not is_valid_execute_response(results, len(batch)):
+            # It is unknown, which calls were made, so they aren't repeated
+            if self.logger is not None:
+                self.logger.warning(
+                    f"Неожиданный ответ на execute, сообщения не будут "
+                    f"отправлены повторно: {results!r}"
+                )
+            exception = UnexpectedExecuteResponse(repr(results))
+            for pending_send in batch:
+                pending_send.set_exception(exception)
+            return
+        for pending_send, result in zip(batch, results):
+            if result is not False:
+                self._mark_as_sent(pending_send)
+        if results[-1] is False:
+            failed_call_num = len(results) - 1
+            # The calls after the failed one weren't made, so they are sent
+            # after it, keeping the order
+            self._pending_sends.extendleft(
+                reversed(batch[failed_call_num + 1:])
+            )
+            # Sending it again to get its error (or to send it, if the error
+            # was temporary)
+            self.send_stats.fallback_parts += 1
+            await self._send_single(batch[failed_call_num])